@@ -1,7 +1,5 @@
 from flask import Flask
 from flask_login import login_required
-from dash.long_callback import DiskcacheLongCallbackManager
-import diskcache
 
 
 def create_app():
@@ -11,6 +9,7 @@ def create_app():
     register_blueprints(app)
     register_dashapps(app)
     register_extensions(app)
+    register_commands(app)
 
     return app
 
@@ -36,16 +35,12 @@ def register_dashapps(app):
         "content": "width=device-width, initial-scale=1, shrink-to-fit=no",
     }
 
-    cache = diskcache.Cache("./cache")
-    lcm = DiskcacheLongCallbackManager(cache)
-
     with app.app_context():
         app = analogs.init_dash(app)
         app = data_table.init_dash(app)
         app = price_index.init_dash(
             app,
             meta_viewport,
-            lcm,
         )
     _protect_dashviews(app)
 
@@ -73,3 +68,30 @@ def register_extensions(app):
     login.init_app(app)
     login.login_view = "auth.login"
     migrate.init_app(app, db)
+
+
+def register_commands(app):
+    @app.cli.command("refresh-aggregates")
+    def refresh_aggregates():
+        """Rebuild the latest prices and daily aggregates from the store table."""
+        from app.crawler.aggregates import refresh_latest_price, refresh_price_daily
+        from app.database import get_engine
+
+        with get_engine().begin() as conn:
+            latest = refresh_latest_price(conn)
+            rows = refresh_price_daily(conn)
+        print(f"Rebuilt {latest} latest prices and {rows} daily price aggregates")
+
+    @app.cli.command("warm-cache")
+    def warm_cache():
+        """Render every price-index figure into the shared cache."""
+        from app.dash import price_index
+
+        price_index.warm_cache()
+
+    @app.cli.command("match-analogs")
+    def match_analogs():
+        """Propose analog pairs between the eshops for review."""
+        from app.matching import run_matching
+
+        run_matching()
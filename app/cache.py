@@ -0,0 +1,230 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+import diskcache
+from sqlalchemy import text
+
+from config import Config
+from .database import get_engine
+
+_MISSING = object()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+# names in the cache_version table
+DATA_VERSION = "data"
+ANALOGS_VERSION = "analogs"
+
+
+def shared_cache():
+    """Return the diskcache shared by every worker process of this host."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = diskcache.Cache(Config.CACHE_DIR)
+    return _shared
+
+
+# versions read from the database: (expires, {name: version})
+_versions = (0.0, {})
+_versions_lock = threading.Lock()
+# called with the new version in a thread when a process sees new data
+_data_listeners = []
+
+
+def version(name):
+    """The current version of ``name``, read at most every ``CACHE_VERSION_TTL`` seconds.
+
+    The versions live in the database rather than the per-host diskcache, so
+    a crawl on a worker host invalidates the caches of every web host.
+    """
+    global _versions
+    expires, versions = _versions
+    if expires <= time.monotonic():
+        with _versions_lock:
+            expires, versions = _versions
+            if expires <= time.monotonic():
+                with get_engine().connect() as conn:
+                    rows = conn.execute(text("SELECT name, version FROM cache_version;"))
+                    fresh = {row.name: row.version for row in rows}
+                _versions = (time.monotonic() + Config.CACHE_VERSION_TTL, fresh)
+                if fresh.get(DATA_VERSION, 0) != versions.get(DATA_VERSION):
+                    for listener in _data_listeners:
+                        threading.Thread(
+                            target=listener, args=(fresh.get(DATA_VERSION, 0),), daemon=True
+                        ).start()
+                versions = fresh
+    return versions.get(name, 0)
+
+
+def bump_version(conn, name):
+    """Increment the version of ``name`` in the transaction of ``conn``.
+
+    Bump in the transaction that changes the data, so no process can see
+    the new version before the new data.
+    """
+    global _versions
+    new = conn.execute(
+        text(
+            """
+        INSERT INTO cache_version (name, version) VALUES (:name, 1)
+        ON CONFLICT (name) DO UPDATE SET version = cache_version.version + 1
+        RETURNING version;
+        """
+        ),
+        name=name,
+    ).scalar()
+    # read again on the next use, once the transaction has committed
+    _versions = (0.0, _versions[1])
+    return new
+
+
+def on_new_data(listener):
+    """Call ``listener(version)`` in a thread whenever this process sees a new data version."""
+    _data_listeners.append(listener)
+
+
+def data_version():
+    return version(DATA_VERSION)
+
+
+def bump_data_version(conn):
+    """Mark every cached query result as stale, called where new data is saved."""
+    return bump_version(conn, DATA_VERSION)
+
+
+def analogs_version():
+    return version(ANALOGS_VERSION)
+
+
+def bump_analogs_version(conn):
+    """Mark the cached analog list as stale, called where analogs are saved."""
+    return bump_version(conn, ANALOGS_VERSION)
+
+
+# every ResultCache by name, reported by /metrics/cache
+RESULT_CACHES = {}
+
+
+def normalize(value):
+    """Make callback inputs hashable, ignoring the order of selected items."""
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted((normalize(item) for item in value), key=repr))
+    if isinstance(value, dict):
+        return tuple(sorted((key, normalize(item)) for key, item in value.items()))
+    return value
+
+
+class ResultCache:
+    """In-process LRU cache with a TTL, backed by the shared diskcache.
+
+    Keys include the current data version, so results computed before the
+    last crawl are never served again and age out of both caches.
+    """
+
+    def __init__(self, name, maxsize=None, ttl=None, shared=None):
+        self.name = name
+        self.maxsize = Config.RESULT_CACHE_SIZE if maxsize is None else maxsize
+        self.ttl = Config.RESULT_CACHE_TTL if ttl is None else ttl
+        self.shared = Config.RESULT_CACHE_SHARED if shared is None else shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        RESULT_CACHES[name] = self
+
+    def key(self, *args):
+        return (self.name, data_version(), normalize(args))
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+
+        if self.shared:
+            value = shared_cache().get(key, _MISSING)
+            if value is not _MISSING:
+                self._store(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return _MISSING
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.shared:
+            shared_cache().set(key, value, expire=self.ttl)
+
+    def warm(self, key, value):
+        """Precompute an entry for other processes, without filling this one."""
+        if self.shared:
+            shared_cache().set(key, value, expire=self.ttl)
+        else:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, compute, *args):
+        key = self.key(*args)
+        value = self.get(key)
+        if value is _MISSING:
+            value = compute(*args)
+            self.set(key, value)
+        return value
+
+    def __call__(self, func):
+        """Decorate ``func`` so its results are cached on its arguments."""
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            return self.get_or_compute(func, *args)
+
+        wrapper.cache = self
+        return wrapper
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def cache_metrics():
+    return {
+        "data_version": data_version(),
+        "analogs_version": analogs_version(),
+        "caches": {name: cache.stats() for name, cache in RESULT_CACHES.items()},
+    }
@@ -0,0 +1,78 @@
+from sqlalchemy import text
+
+# (eshop_id, manufacturer_id) pairs of the products in the crawl_prices table
+STAGED_KEYS = """
+    SELECT DISTINCT p.eshop_id, p.manufacturer_id
+    FROM crawl_prices AS c
+    INNER JOIN product AS p ON p.id = c.product_id
+"""
+
+
+# (eshop_id, manufacturer_id) pairs passed as the eshop_ids and
+# manufacturer_ids array parameters
+LISTED_KEYS = """
+    SELECT * FROM unnest(CAST(:eshop_ids AS integer[]), CAST(:manufacturer_ids AS integer[]))
+"""
+
+
+def refresh_price_daily(conn, since=None, keys=None, key_params=None):
+    """Recompute the price_daily aggregates from the store table.
+
+    Only days on or after ``since`` are rebuilt, and only for the
+    ``(eshop_id, manufacturer_id)`` pairs selected by the ``keys`` query
+    with its ``key_params``; without arguments the whole table is rebuilt.
+    Every store row counts towards each day from its ``date`` to its
+    ``last_seen``.
+    """
+    params = dict(key_params or {})
+    delete_filter = ""
+    store_filter = ""
+    if since is not None:
+        params["since"] = since
+        delete_filter += " AND date >= :since"
+        store_filter += """
+            AND (store.last_seen >= :since
+                OR (store.last_seen IS NULL AND store.date >= :since))
+            AND day >= :since"""
+    if keys is not None:
+        delete_filter += f" AND (eshop_id, manufacturer_id) IN ({keys})"
+        store_filter += (
+            f" AND (product.eshop_id, product.manufacturer_id) IN ({keys})"
+        )
+
+    conn.execute(text(f"DELETE FROM price_daily WHERE TRUE{delete_filter};"), params)
+    result = conn.execute(
+        text(
+            f"""
+        INSERT INTO price_daily (date, eshop_id, manufacturer_id, price_sum, price_count, price_mean)
+        SELECT day::date, product.eshop_id, product.manufacturer_id, SUM(store.price), COUNT(*), AVG(store.price)
+        FROM store
+        INNER JOIN product ON store.product_id = product.id
+        CROSS JOIN LATERAL generate_series(
+            date_trunc('day', store.date),
+            date_trunc('day', COALESCE(store.last_seen, store.date)),
+            interval '1 day'
+        ) AS day
+        WHERE TRUE{store_filter}
+        GROUP BY day::date, product.eshop_id, product.manufacturer_id;
+        """
+        ),
+        params,
+    )
+    return result.rowcount
+
+
+def refresh_latest_price(conn):
+    """Rebuild the latest_price table from the newest store row of each product."""
+    conn.execute(text("DELETE FROM latest_price;"))
+    result = conn.execute(
+        text(
+            """
+        INSERT INTO latest_price (product_id, price, date, last_seen)
+        SELECT DISTINCT ON (product_id) product_id, price, date, COALESCE(last_seen, date)
+        FROM store
+        ORDER BY product_id, date DESC;
+        """
+        )
+    )
+    return result.rowcount
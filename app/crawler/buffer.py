@@ -0,0 +1,75 @@
+import pandas as pd
+
+COLUMNS = ["title", "manufacturer", "eshop", "url", "price"]
+
+
+class ProductBuffer:
+    """Columnar accumulator for parsed products.
+
+    Rows are appended to plain per-column lists and deduplicated on
+    ``(eshop, url)`` with a hash set, so building a catalogue is linear in
+    the number of products. The DataFrame is only built by ``to_frame``.
+    Buffers built from the same ``seen`` set skip products already added to
+    any of them, which lets a crawl emit one buffer per page.
+    """
+
+    __slots__ = ("title", "manufacturer", "eshop", "url", "price", "_seen")
+
+    def __init__(self, seen=None):
+        self.title = []
+        self.manufacturer = []
+        self.eshop = []
+        self.url = []
+        self.price = []
+        self._seen = set() if seen is None else seen
+
+    def __len__(self):
+        return len(self.url)
+
+    def __contains__(self, key):
+        return key in self._seen
+
+    def append(self, title, manufacturer, eshop, url, price):
+        """Add a product, returning False if it was already buffered."""
+        key = (eshop, url)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        self.title.append(title)
+        self.manufacturer.append(manufacturer)
+        self.eshop.append(eshop)
+        self.url.append(url)
+        self.price.append(price)
+        return True
+
+    def extend(self, titles, manufacturers, eshops, urls, prices):
+        """Add columns of products, returning how many were new."""
+        if not len(titles) == len(manufacturers) == len(eshops) == len(urls) == len(
+            prices
+        ):
+            raise ValueError("All product columns must have the same length")
+        added = 0
+        for row in zip(titles, manufacturers, eshops, urls, prices):
+            added += self.append(*row)
+        return added
+
+    def update(self, other):
+        """Merge another buffer into this one, returning how many were new."""
+        return self.extend(
+            other.title, other.manufacturer, other.eshop, other.url, other.price
+        )
+
+    def columns(self):
+        return self.title, self.manufacturer, self.eshop, self.url, self.price
+
+    def to_frame(self):
+        return pd.DataFrame(
+            {
+                "title": self.title,
+                "manufacturer": self.manufacturer,
+                "eshop": self.eshop,
+                "url": self.url,
+                "price": pd.Series(self.price, dtype="float64"),
+            },
+            columns=COLUMNS,
+        )
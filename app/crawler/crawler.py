@@ -1,340 +1,443 @@
+import asyncio
+import io
+import time
 import httpx
-from lxml import html
-import pandas as pd
 from config import Config
-from sqlalchemy import create_engine, text
-
-engine = create_engine(Config.SQLALCHEMY_DATABASE_URI, client_encoding="utf8")
-
-# Abstract Class for Crawlers
+from sqlalchemy import text
+
+from ..cache import bump_data_version
+from ..database import get_engine
+from .aggregates import LISTED_KEYS, STAGED_KEYS, refresh_price_daily
+from .buffer import COLUMNS, ProductBuffer
+from .engine import CrawlEngine
+from .http_cache import PageCache
+from .specs import SPECS
+
+MANUFACTURERS = [
+    "uriage",
+    "bioderma",
+    "filorga",
+    "vichy",
+    "avene",
+    "la roche-posay",
+    "svr",
+    "apivita",
+]
+
+
+# Abstract Class for Crawlers, see specs.CrawlerSpec for the attributes
 class Crawler:
-    def __init__(self):
-        pass
-
-    def get_link(self, url):
-        r = httpx.get(
-            url,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36"
-            },
+    eshop = None
+    base_url = None
+    url = None
+    manufacturers = MANUFACTURERS
+    # called with (body, manufacturer, eshop), returning product columns
+    parser = None
+    parser_version = 2
+    pagination = "pages"
+    page_size = None
+    slug = None
+    # the eshop's own request limits, see specs.CrawlerSpec
+    concurrency = None
+    delay = None
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Create the crawler class of the eshop described by ``spec``."""
+        attributes = {
+            "eshop": spec.eshop,
+            "base_url": spec.base_url,
+            "url": spec.url,
+            "parser": spec.parser,
+            "pagination": spec.pagination,
+            "page_size": spec.page_size,
+            "slug": staticmethod(spec.slug) if spec.slug else None,
+            "concurrency": spec.concurrency,
+            "delay": spec.delay,
+        }
+        if spec.manufacturers is not None:
+            attributes["manufacturers"] = spec.manufacturers
+        return type(f"Crawler{spec.eshop}", (cls,), attributes)
+
+    def __init__(
+        self, base_url=None, concurrency=None, delay=None, transport=None, cache=None
+    ):
+        # base_url and transport allow pointing a crawler at a local stub server
+        if base_url is not None:
+            self.base_url = base_url.rstrip("/")
+        # the arguments, then the config by eshop, the spec and the defaults
+        if concurrency is None:
+            concurrency = Config.CRAWLER_CONCURRENCIES.get(self.eshop, self.concurrency)
+        self.concurrency = concurrency or Config.CRAWLER_CONCURRENCY
+        if delay is None:
+            delay = Config.CRAWLER_DELAYS.get(self.eshop, self.delay)
+        self.delay = Config.CRAWLER_DELAY if delay is None else delay
+        self.transport = transport
+        self.incremental = Config.CRAWLER_INCREMENTAL_SAVE
+        # PageCache shared by the crawls of this crawler, see create_crawl_engine
+        self.cache = cache
+        # (eshop_id, manufacturer_id) pairs saved since the last refresh_aggregates,
+        # and the first day the heartbeat window of those saves reached back to
+        self.saved_keys = set()
+        self.saved_since = None
+        # monotonic time of the last refresh_aggregates
+        self.refreshed_at = None
+        # pages of the last crawl that failed after every retry
+        self.failed_pages = 0
+
+    def create_crawl_engine(self):
+        if self.cache is None and Config.CRAWLER_CACHE:
+            self.cache = PageCache()
+        return CrawlEngine(
+            concurrency=self.concurrency,
+            delay=self.delay,
+            transport=self.transport,
+            cache=self.cache,
         )
-        r.raise_for_status()  # raise an error if status_code != 200
-        content = html.fromstring(r.content)
-        return content
 
     def crawl(self):
-        pass
+        """Crawl the whole catalogue into a single DataFrame."""
+        return asyncio.run(self._crawl())
+
+    async def _crawl(self):
+        products = ProductBuffer()
+        async with self.create_crawl_engine() as crawl_engine:
+            try:
+                async for batch in self.batches(crawl_engine):
+                    products.update(batch)
+            finally:
+                self.failed_pages = crawl_engine.failed_pages
+        return products.to_frame()
+
+    def stream(self, sink=None, queue_size=None):
+        """Crawl page by page, passing each batch to ``sink`` as it arrives.
+
+        ``sink`` defaults to ``save`` and runs in a worker thread, so pages
+        keep being fetched while a batch is written. At most ``queue_size``
+        parsed batches wait for the sink; beyond that the crawl blocks.
+        Returns the number of products handed to the sink.
+
+        With the default sink, the daily aggregates are refreshed and the
+        data version bumped every ``CRAWLER_REFRESH_INTERVAL`` seconds and
+        once the crawl ends, see ``save_and_refresh``.
+        """
+        if sink is not None:
+            return asyncio.run(self._stream(sink, queue_size))
+        self.refreshed_at = time.monotonic()
+        try:
+            return asyncio.run(self._stream(self.save_and_refresh, queue_size))
+        finally:
+            # the pages saved so far count even when the crawl failed part way
+            self.refresh_aggregates()
+
+    async def _stream(self, sink, queue_size):
+        rows = 0
+        seen = set()
+        async with self.create_crawl_engine() as crawl_engine:
+            try:
+                async for batch in self.batches(crawl_engine, queue_size):
+                    # drop products already emitted by another manufacturer
+                    products = ProductBuffer(seen)
+                    if not products.update(batch):
+                        continue
+                    await asyncio.to_thread(sink, products.to_frame())
+                    rows += len(products)
+            finally:
+                self.failed_pages = crawl_engine.failed_pages
+        return rows
+
+    async def batches(self, crawl_engine, queue_size=None):
+        """Asynchronously iterate over parsed ``ProductBuffer`` batches.
+
+        Every manufacturer is crawled concurrently over the shared client and
+        emits one batch per page into a bounded queue.
+        """
+        queue = asyncio.Queue(maxsize=queue_size or Config.CRAWLER_QUEUE_SIZE)
+        producer = asyncio.ensure_future(
+            asyncio.gather(
+                *(
+                    self.crawl_manufacturer(crawl_engine, manufacturer, queue.put)
+                    for manufacturer in self.manufacturers
+                )
+            )
+        )
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait(
+                    {getter, producer}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter.done():
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                # producers are done, hand out what is left and surface errors
+                while not queue.empty():
+                    yield queue.get_nowait()
+                producer.result()
+                return
+        finally:
+            producer.cancel()
+
+    async def crawl_manufacturer(self, crawl_engine, manufacturer, emit):
+        """Crawl one manufacturer as described by the crawler's spec."""
+        slug = manufacturer if self.slug is None else self.slug(manufacturer)
+        key = self.parse_key(manufacturer)
+
+        def parse(body):
+            return self.parse(body, manufacturer)
+
+        def make_url(page=None):
+            return self.url.format(
+                base_url=self.base_url, manufacturer=slug, page=page
+            )
+
+        if self.pagination == "single":
+            url = make_url()
+            try:
+                columns = await crawl_engine.get_parsed(url, parse, key)
+            except httpx.HTTPError as exc:
+                crawl_engine.page_failed(url, exc)
+                return
+            products = ProductBuffer()
+            products.extend(*columns)
+            await emit(products)
+            return
+
+        seen = set()
+        async for page, columns in crawl_engine.pages(make_url, parse=parse, key=key):
+            products = ProductBuffer(seen)
+            count = len(columns[4])
+            added = products.extend(*columns)
+            await emit(products)
+            # a repeated product means the eshop served the last page again
+            if not count or added != count:
+                break
+            if self.page_size is not None and count < self.page_size:
+                break
+
+    def parse(self, body, manufacturer):
+        return self.parser(body, manufacturer, self.eshop)
+
+    def parse_key(self, manufacturer):
+        """Name the page cache stores parse results under.
+
+        Bump ``parser_version`` whenever the parsers change what they return.
+        """
+        return f"{self.eshop}:{self.parser_version}:{manufacturer}"
 
     def save(self, df):
+        """Upsert crawled products and record their current prices.
+
+        Rows are streamed into a temporary staging table with ``COPY`` and
+        merged into eshop, manufacturer, product and store with set-based
+        statements, all in one transaction. Returns the number of prices
+        saved.
+
+        With ``incremental`` set, a store row is only inserted when a price
+        changed; an unchanged price moves the row's ``last_seen`` heartbeat
+        instead, so every row covers the days from ``date`` to ``last_seen``.
+        A product not seen for ``CRAWLER_HEARTBEAT_GAP`` hours starts a new
+        row, which keeps crawl gaps apart from unchanged prices.
+
+        The daily aggregates of the saved products are left to
+        ``refresh_aggregates``, which runs every few minutes of a crawl
+        instead of once per page.
+        """
+        if df.empty:
+            return 0
+
+        # serialize the batch as csv for COPY, which also takes care of quoting
+        data = io.StringIO()
+        df[COLUMNS].to_csv(data, index=False, header=False)
+        data.seek(0)
+
         # start connection with database
-        with engine.begin() as conn:
+        with get_engine().begin() as conn:
+            cursor = conn.connection.cursor()
+            cursor.execute(
+                """
+                CREATE TEMPORARY TABLE crawl_staging (
+                    title text,
+                    manufacturer text,
+                    eshop text,
+                    url text,
+                    price double precision
+                ) ON COMMIT DROP;
+                """
+            )
+            cursor.copy_expert(
+                f"COPY crawl_staging ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                data,
+            )
+            cursor.close()
 
-            sql_list = [f"('{eshop}')" for eshop in df.eshop.unique()]
-            # generate sql sequences
-            sql_str = ",".join(sql_list)
             # insert unique eshops to database
             conn.execute(
-                f"""
+                text(
+                    """
                 INSERT INTO eshop (name)
-                VALUES {sql_str}
+                SELECT DISTINCT eshop FROM crawl_staging
                 ON CONFLICT (name)
                 DO NOTHING;
                 """
+                )
             )
 
-            sql_list = [
-                f"('{manufacturer}')" for manufacturer in df.manufacturer.unique()
-            ]
-            sql_str = ",".join(sql_list)
             # insert unique manufacturers to database
             conn.execute(
-                f"""
+                text(
+                    """
                 INSERT INTO manufacturer (name)
-                VALUES {sql_str}
+                SELECT DISTINCT manufacturer FROM crawl_staging
                 ON CONFLICT (name)
                 DO NOTHING;
                 """
+                )
             )
 
-            sql_list = [
-                f"""('{title.replace("'", "''")}', '{url.replace("'", "''")}', '{manufacturer}', '{eshop}')"""
-                for title, manufacturer, eshop, url, price in list(
-                    df.itertuples(index=False, name=None)
-                )
-            ]
-            sql_str = ",".join(sql_list)
-            # insert unique products to database
-            conn.execute(
+            # insert unique products to database, queueing the new ones for
+            # analog matching, see app/matching.py
+            result = conn.execute(
                 text(
-                    f"""
-                WITH inputvalues(name, url, manufacturer, eshop) AS (
-                    VALUES {sql_str}
+                    """
+                WITH inserted AS (
+                    INSERT INTO product (name, url, manufacturer_id, eshop_id)
+                    SELECT d.title, d.url, manufacturer.id, eshop.id
+                    FROM crawl_staging AS d
+                    INNER JOIN eshop ON eshop.name = d.eshop
+                    INNER JOIN manufacturer ON manufacturer.name = d.manufacturer
+                    ON CONFLICT
+                    DO NOTHING
+                    RETURNING id
                 )
-                INSERT INTO product (name, url, manufacturer_id, eshop_id)
-                SELECT d.name, d.url, manufacturer.id, eshop.id
-                FROM inputvalues as d
-                INNER JOIN eshop ON eshop.name = d.eshop
-                INNER JOIN manufacturer ON manufacturer.name = d.manufacturer
-                ON CONFLICT
-                DO NOTHING;
+                INSERT INTO match_queue (product_id, queued_at)
+                SELECT id, now() FROM inserted;
                 """
                 )
             )
+            new = result.rowcount
 
-            sql_list = [
-                f"""((SELECT id FROM product WHERE name='{title.replace("'", "''")}'), {price}, now())"""
-                for title, manufacturer, eshop, url, price in list(
-                    df.itertuples(index=False, name=None)
-                )
-            ]
-            sql_str = ",".join(sql_list)
-            # insert the data of current prices of products into database
-            result = conn.execute(
+            # resolve every crawled product to its id once
+            conn.execute(
                 text(
-                    f"""
-                WITH inputvalues(id, price, date) AS (
-                    VALUES {sql_str}
-                )
-                INSERT INTO store (product_id, price, date)
-                SELECT d.id, d.price, d.date
-                FROM inputvalues as d
-                WHERE d.id IS NOT NULL;
+                    """
+                CREATE TEMPORARY TABLE crawl_prices ON COMMIT DROP AS
+                SELECT DISTINCT ON (product.id) product.id AS product_id, d.price
+                FROM crawl_staging AS d
+                INNER JOIN product ON product.name = d.title
+                ORDER BY product.id;
                 """
                 )
             )
-            print(f"Result: {result}\nlastrowid: {result.lastrowid}")
-
-
-class CrawlerEurovaistine(Crawler):
-    def __init__(self):
-        super().__init__()
-
-    def crawl(self):
-        df = pd.DataFrame(columns=["title", "manufacturer", "eshop", "url", "price"])
-        for manufacturer in [
-            "uriage",
-            "bioderma",
-            "filorga",
-            "vichy",
-            "avene",
-            "la roche-posay",
-            "svr",
-            "apivita",
-        ]:
-
-            page = 1
-            while True:
-                url = f"https://www.eurovaistine.lt/paieska/rezultatai?q={manufacturer}&page={page}"
-                print(f"Getting url: {url}")
-
-                try:
-                    content = super().get_link(url)
-                except httpx.HTTPError as exc:
-                    print(f"Error while requesting {exc.request.url!r}.")
-                    if page < 10:
-                        continue
-                    else:
-                        break
-
-                elements = content.xpath('//div[@class="product-card"]')
-
-                for element in elements:
-                    _url = element.xpath('a[@class="product-card--link"]/@href')[0]
-                    _title = element.xpath(
-                        'div[@class="right-content"]/div[@class="product-card--title-box"]/div[1]/div[@class="product-card--title"]/text()'
-                    )[0]
-                    _title = _title.strip()
-                    _manufacturer = manufacturer.capitalize()
-                    _price = element.xpath(
-                        'div[@class="right-content"]/div[@class="product-card--price"]/text()'
-                    )[0]
-                    _price = (
-                        _price.strip()
-                        .replace(",", ".")
-                        .replace("&nbsp;", "")
-                        .replace("\xa0", "")
-                        .replace("€", "")
-                    )
-                    if not _price:
-                        _price = element.xpath(
-                            'div[@class="right-content"]/div[@class="product-card--price"]/s/text()'
-                        )[0]
-                        _price = (
-                            _price.strip()
-                            .replace(",", ".")
-                            .replace("&nbsp;", "")
-                            .replace("\xa0", "")
-                            .replace("€", "")
-                        )
-                    _price = float(_price)
-                    df = pd.concat(
-                        [
-                            df,
-                            pd.DataFrame(
-                                {
-                                    "title": [_title],
-                                    "url": [_url],
-                                    "price": [_price],
-                                    "manufacturer": [_manufacturer],
-                                    "eshop": ["Eurovaistine"],
-                                }
-                            ),
-                        ]
-                    )
-                preprocessed_len = len(df)
-                df = df.drop_duplicates().reset_index(drop=True)
-                afterprocessed_len = len(df)
-                page += 1
-                if len(elements) < 48 or (preprocessed_len != afterprocessed_len):
-                    break
-        return df
-
-
-class CrawlerBenu(Crawler):
-    # override the function
-    def crawl(self):
-        df = pd.DataFrame(columns=["title", "manufacturer", "eshop", "url", "price"])
-        for manufacturer in [
-            "uriage",
-            "bioderma",
-            "filorga",
-            "vichy",
-            "avene",
-            "la roche-posay",
-            "svr",
-            "apivita",
-        ]:
-            # generating dynamic url for specific manufacturer
-            url = f"https://www.benu.lt/{manufacturer.replace(' ', '-')}?vars/pageSize/all"
-            print(f"Getting url: {url}")
-
-            try:
-                # using abstract's class function to send a HTTP request
-                content = super().get_link(url)
-            except httpx.HTTPError as exc:
-                # catching errors
-                print(f"Error while requesting {exc.request.url!r}. -- {exc}")
-                continue
-
-            # finding an element in DOM
-            elements = content.xpath('//div[@class="productsList__wrap"]/div/div')
-            # for each element obtain information
-            for element in elements:
-                try:
-                    _url = element.xpath(
-                        'div/div[@class="bnProductCard__top"]/a[@class="bnProductCard__title"]/@href'
-                    )[0]
-                except Exception as e:
-                    continue
-                _title = element.xpath(
-                    'div/div[@class="bnProductCard__top"]/a[@class="bnProductCard__title"]/h3/text()'
-                )[0]
-                _title = _title.strip()
-                _manufacturer = manufacturer.capitalize()
-                _price = element.xpath(
-                    'div/div[@class="bnProductCard__bottom"]/div[@class="bnProductCard__price "]/span/span/span[1]/text()'
-                )[0]
-                # validate the data
-                _price = (
-                    _price.strip()
-                    .replace(",", ".")
-                    .replace("&nbsp;", "")
-                    .replace("\xa0", "")
-                    .replace("€", "")
-                )
-                if not _price:
-                    print(_title)
-                    continue
-                _price = float(_price)
-                df = pd.concat(
-                    [
-                        df,
-                        pd.DataFrame(
-                            {
-                                "title": [_title],
-                                "url": [_url],
-                                "price": [_price],
-                                "manufacturer": [_manufacturer],
-                                "eshop": ["Benu"],
-                            }
-                        ),
-                    ]
-                )
-                df = df.drop_duplicates().reset_index(drop=True)
-        return df
-
-
-class CrawlerHerba(Crawler):
-    def crawl(self):
-        df = pd.DataFrame(columns=["title", "manufacturer", "eshop", "url", "price"])
-        for manufacturer in ["uriage", "apivita"]:
-            page = 1
-
-            while True:
-                url = f"https://www.herba.lt/catalogsearch/result/index/?p={page}&q={manufacturer}"
-                print(f"Getting url: {url}")
-
-                try:
-                    content = super().get_link(url)
-                except httpx.HTTPError as exc:
-                    print(f"Error while requesting {exc.request.url!r}.")
-                    if page < 10:
-                        continue
-                    else:
-                        break
-
-                elements = content.xpath('//div[@class="item-inner"]')
-
-                titles = content.xpath('//h4[@class="product-name"]/a/text()')
-
-                manufacturers = [manufacturer.capitalize()] * len(titles)
-
-                urls = content.xpath('//h4[@class="product-name"]/a/@href')
 
-                discounted_prices = content.xpath(
-                    '//span[contains(@id, "product-price") and not(contains(@id, "side")) and @class!="regular-price"]/text()'
-                )
-                normal_prices = content.xpath(
-                    '//span[@class="regular-price" and contains(@id, "product-price") and not(contains(@id, "side"))]/span/text()'
-                )
-
-                prices = [
-                    price.strip()
-                    .replace(",", ".")
-                    .replace("&nbsp;", "")
-                    .replace("\xa0", "")
-                    .replace("€", "")
-                    for price in discounted_prices + normal_prices
-                ]
-                prices = list(filter(None, prices))
-                prices = list(map(float, prices))
-
-                df = pd.concat(
-                    [
-                        df,
-                        pd.DataFrame(
-                            {
-                                "title": titles,
-                                "url": urls,
-                                "price": prices,
-                                "manufacturer": manufacturers,
-                                "eshop": ["Herba"] * len(prices),
-                            }
-                        ),
-                    ]
-                )
-
-                preprocessed_len = len(df)
-                df = df.drop_duplicates().reset_index(drop=True)
-                afterprocessed_len = len(df)
-
-                page += 1
+            # an unchanged price seen within `gap` hours extends its store row,
+            # a gap of 0 stores every crawled price as a new row
+            gap = {"gap": Config.CRAWLER_HEARTBEAT_GAP if self.incremental else 0}
+            conn.execute(
+                text(
+                    """
+                UPDATE store SET last_seen = now()
+                FROM latest_price AS l, crawl_prices AS c
+                WHERE c.product_id = l.product_id
+                AND l.price = c.price
+                AND l.last_seen >= now() - :gap * interval '1 hour'
+                AND store.product_id = l.product_id
+                AND store.date = l.date;
+                """
+                ),
+                gap,
+            )
 
-                if len(prices) < 24 or (preprocessed_len != afterprocessed_len):
-                    break
+            # insert the data of new or changed prices into database
+            result = conn.execute(
+                text(
+                    """
+                INSERT INTO store (product_id, price, date, last_seen)
+                SELECT c.product_id, c.price, now(), now()
+                FROM crawl_prices AS c
+                LEFT JOIN latest_price AS l ON l.product_id = c.product_id
+                WHERE l.product_id IS NULL
+                OR l.price <> c.price
+                OR l.last_seen < now() - :gap * interval '1 hour';
+                """
+                ),
+                gap,
+            )
+            changed = result.rowcount
 
-        return df
+            # keep the latest known price of every product up to date
+            result = conn.execute(
+                text(
+                    """
+                INSERT INTO latest_price (product_id, price, date, last_seen)
+                SELECT c.product_id, c.price, now(), now()
+                FROM crawl_prices AS c
+                ON CONFLICT (product_id)
+                DO UPDATE SET (price, date, last_seen) = (
+                    EXCLUDED.price,
+                    CASE WHEN latest_price.price = EXCLUDED.price
+                        AND latest_price.last_seen >= now() - :gap * interval '1 hour'
+                    THEN latest_price.date ELSE EXCLUDED.date END,
+                    EXCLUDED.last_seen
+                );
+                """
+                ),
+                gap,
+            )
+            saved = result.rowcount
+
+            # the daily aggregates the heartbeat window can have touched
+            since = conn.execute(
+                text("SELECT date_trunc('day', now() - :gap * interval '1 hour')"),
+                gap,
+            ).scalar()
+            keys = conn.execute(text(STAGED_KEYS)).fetchall()
+
+        self.saved_keys.update(tuple(key) for key in keys)
+        if self.saved_since is None or since < self.saved_since:
+            self.saved_since = since
+        print(f"Saved {saved} prices, {changed} changed, {new} new products", flush=True)
+        return saved
+
+    def save_and_refresh(self, df):
+        """``save`` a batch, refreshing the aggregates if the last refresh is old enough.
+
+        The graphs of a long crawl fill in as it goes, at the cost of one
+        refresh per ``CRAWLER_REFRESH_INTERVAL`` seconds rather than per page.
+        """
+        saved = self.save(df)
+        if time.monotonic() - self.refreshed_at >= Config.CRAWLER_REFRESH_INTERVAL:
+            self.refresh_aggregates()
+        return saved
+
+    def refresh_aggregates(self):
+        """Rebuild the daily aggregates of everything saved since the last call.
+
+        Bumps the data version, which invalidates the cached dashboard
+        queries and the analogs page product index.
+        """
+        self.refreshed_at = time.monotonic()
+        if not self.saved_keys:
+            return
+        keys, self.saved_keys = sorted(self.saved_keys), set()
+        since, self.saved_since = self.saved_since, None
+        with get_engine().begin() as conn:
+            refresh_price_daily(
+                conn,
+                since=since,
+                keys=LISTED_KEYS,
+                key_params={
+                    "eshop_ids": [eshop_id for eshop_id, _ in keys],
+                    "manufacturer_ids": [manufacturer_id for _, manufacturer_id in keys],
+                },
+            )
+            # cached dashboard queries were computed from the previous data
+            bump_data_version(conn)
 
 
-class CrawlerGintarine(Crawler):
-    pass
+# one crawler class per eshop, new eshops only need a spec in specs.py
+CRAWLER_CLASSES = {spec.eshop: Crawler.from_spec(spec) for spec in SPECS}
+CrawlerEurovaistine = CRAWLER_CLASSES["Eurovaistine"]
+CrawlerBenu = CRAWLER_CLASSES["Benu"]
+CrawlerHerba = CRAWLER_CLASSES["Herba"]
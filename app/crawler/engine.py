@@ -0,0 +1,224 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from lxml import html
+
+from .http_cache import Page
+from .retry import CircuitBreaker, is_retryable, retrying
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36"
+
+
+class CrawlEngine:
+    """Shared async HTTP client with per-host concurrency limits.
+
+    A single pooled ``httpx.AsyncClient`` is reused for every request made
+    through the engine, so connections are kept alive between pages. Each
+    host gets its own semaphore (``concurrency``) and a minimum interval
+    between request starts (``delay``) to stay polite towards the eshops.
+
+    Connection errors, 429 and 5xx responses are retried with exponential
+    backoff (or after the server's ``Retry-After``), see app/crawler/retry.py.
+    The host's slot is released while waiting for the next attempt. A host
+    that keeps failing trips its circuit breaker, and requests to it then
+    fail fast with ``CircuitOpen`` until the cooldown has passed.
+    """
+
+    def __init__(
+        self, concurrency=4, delay=0.0, timeout=30.0, transport=None, cache=None
+    ):
+        self.concurrency = concurrency
+        self.delay = delay
+        self.timeout = timeout
+        self.transport = transport
+        # optional PageCache for conditional requests and parse results
+        self.cache = cache
+        self.client = None
+        self._semaphores = {}
+        self._locks = {}
+        self._last_request = {}
+        self._breakers = {}
+        self.retries = 0
+        # pages given up on after every retry, their products are missing
+        self.failed_pages = 0
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            http2=HTTP2 and self.transport is None,
+            limits=httpx.Limits(
+                max_connections=self.concurrency * 4,
+                max_keepalive_connections=self.concurrency * 4,
+            ),
+            timeout=self.timeout,
+            follow_redirects=True,
+            transport=self.transport,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+        self.client = None
+        if self.cache is not None:
+            print(f"Page cache: {self.cache.summary()}", flush=True)
+        opened = self.circuits_opened
+        if self.retries or opened or self.failed_pages:
+            print(
+                f"Retried requests: {self.retries}, circuit breakers opened: {opened}, "
+                f"failed pages: {self.failed_pages}",
+                flush=True,
+            )
+
+    @property
+    def circuits_opened(self):
+        """How many times a host's circuit breaker has opened."""
+        return sum(breaker.opened for breaker in self._breakers.values())
+
+    def _host_state(self, host):
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.concurrency)
+            self._locks[host] = asyncio.Lock()
+            self._last_request[host] = 0.0
+            self._breakers[host] = CircuitBreaker()
+        return self._semaphores[host], self._locks[host]
+
+    async def _wait_politely(self, host, lock):
+        # space out request starts to the same host by at least `delay` seconds
+        async with lock:
+            wait = self._last_request[host] + self.delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_request[host] = time.monotonic()
+
+    def _before_sleep(self, retry_state):
+        self.retries += 1
+        print(
+            f"Retrying in {retry_state.next_action.sleep:.1f}s "
+            f"(attempt {retry_state.attempt_number}) -- {retry_state.outcome.exception()}",
+            flush=True,
+        )
+
+    async def _get_once(self, url, headers, host):
+        semaphore, lock = self._host_state(host)
+        async with semaphore:
+            await self._wait_politely(host, lock)
+            print(f"Getting url: {url}")
+            r = await self.client.get(url, headers=headers)
+            if r.status_code != 304:
+                r.raise_for_status()  # raise an error if status_code != 200
+            return r
+
+    async def get(self, url, headers=None):
+        host = urlsplit(url).netloc
+        self._host_state(host)
+        breaker = self._breakers[host]
+        async for attempt in retrying(before_sleep=self._before_sleep):
+            with attempt:
+                trial = breaker.check(host)
+                try:
+                    r = await self._get_once(url, headers, host)
+                except httpx.HTTPError as e:
+                    # a 404 still means the host is up
+                    if is_retryable(e):
+                        breaker.failure()
+                    else:
+                        breaker.success()
+                    raise
+                except BaseException:
+                    # cancelled, or a bug: no verdict on the host
+                    if trial:
+                        breaker.release()
+                    raise
+                breaker.success()
+        return r
+
+    def page_failed(self, url, exc):
+        """Count a page that could not be downloaded even after retrying."""
+        self.failed_pages += 1
+        print(f"Error while requesting {url!r}. -- {exc}", flush=True)
+
+    async def fetch(self, url):
+        """Download ``url`` as a ``Page``, conditionally if it is cached."""
+        if self.cache is None:
+            r = await self.get(url)
+            return Page(url, None, body=r.content)
+
+        entry, headers = self.cache.validators(url)
+        if headers:
+            r = await self.get(url, headers=headers)
+            if r.status_code == 304:
+                page = self.cache.not_modified_page(url, entry)
+                if page is not None:
+                    return page
+                r = await self.get(url)
+        else:
+            r = await self.get(url)
+        return self.cache.store(url, r, entry)
+
+    async def get_link(self, url):
+        page = await self.fetch(url)
+        return html.fromstring(page.body)
+
+    async def get_parsed(self, url, parse, key):
+        """Return ``parse(body)`` for the page at ``url``.
+
+        With a page cache, the result of a page with the same content as
+        before is reused and the page is not parsed again. ``key`` identifies
+        the parser in the cache.
+        """
+        page = await self.fetch(url)
+        if self.cache is None:
+            return parse(page.body)
+        return self.cache.parse(page, key, lambda page: parse(page.body))
+
+    async def pages(self, make_url, first_page=1, max_pages=None, parse=None, key=None):
+        """Yield ``(page, content)`` for consecutive pages in page order.
+
+        ``content`` is the parsed html tree, or ``parse(body)`` when a
+        ``parse`` function is given; see ``get_parsed``.
+
+        Pages are requested concurrently in windows of ``concurrency`` pages,
+        so the caller should stop iterating once it sees the last page; any
+        pages fetched speculatively after it are discarded. A page that fails
+        to download is skipped and counted in ``failed_pages``, and a window
+        in which every page fails ends the pagination.
+        """
+        page = first_page
+        last_page = None if max_pages is None else first_page + max_pages
+        while last_page is None or page < last_page:
+            end = page + self.concurrency
+            if last_page is not None:
+                end = min(end, last_page)
+            window = range(page, end)
+            contents = await asyncio.gather(
+                *(
+                    self.get_link(make_url(p))
+                    if parse is None
+                    else self.get_parsed(make_url(p), parse, key)
+                    for p in window
+                ),
+                return_exceptions=True,
+            )
+
+            failed = 0
+            for p, content in zip(window, contents):
+                if isinstance(content, httpx.HTTPError):
+                    self.page_failed(make_url(p), content)
+                    failed += 1
+                    continue
+                if isinstance(content, BaseException):
+                    raise content
+                yield p, content
+
+            if failed == len(window):
+                return
+            page = end
@@ -0,0 +1,114 @@
+import hashlib
+
+import diskcache
+
+from config import Config
+
+
+class Page:
+    """A downloaded page, its body read from the cache only when needed."""
+
+    __slots__ = ("url", "hash", "_body", "_cache")
+
+    def __init__(self, url, hash, body=None, cache=None):
+        self.url = url
+        self.hash = hash
+        self._body = body
+        self._cache = cache
+
+    @property
+    def body(self):
+        if self._body is None:
+            self._body = self._cache.get_body(self.hash)
+        return self._body
+
+
+class PageCache:
+    """Persistent cache of crawled pages and of what was parsed from them.
+
+    For every url the validators of the last response (``ETag`` and
+    ``Last-Modified``) and the hash of its body are kept, so the next crawl
+    can send a conditional request. Bodies and parse results are stored by
+    content hash: a page that is not modified, or comes back with the same
+    content, is not parsed again.
+    """
+
+    def __init__(self, directory=None, ttl=None):
+        self.cache = diskcache.Cache(directory or Config.CRAWLER_CACHE_DIR)
+        # seconds, entries of pages that are no longer crawled expire
+        self.ttl = Config.CRAWLER_CACHE_TTL * 86400 if ttl is None else ttl
+        self.not_modified = 0
+        self.unchanged = 0
+        self.downloaded = 0
+        self.parsed = 0
+        self.parse_hits = 0
+
+    def validators(self, url):
+        """Return the conditional request headers for ``url``."""
+        entry = self.cache.get(("page", url))
+        headers = {}
+        if entry is None:
+            return entry, headers
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return entry, headers
+
+    def not_modified_page(self, url, entry):
+        """Return the cached page after a 304, or None if its body expired."""
+        if not self.cache.touch(("body", entry["hash"]), expire=self.ttl):
+            return None
+        self.not_modified += 1
+        self.cache.touch(("page", url), expire=self.ttl)
+        return Page(url, entry["hash"], cache=self)
+
+    def store(self, url, response, entry=None):
+        body = response.content
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.downloaded += 1
+        if entry is not None and entry["hash"] == digest:
+            self.unchanged += 1
+        self.cache.set(
+            ("page", url),
+            {
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "hash": digest,
+            },
+            expire=self.ttl,
+        )
+        self.cache.set(("body", digest), body, expire=self.ttl)
+        return Page(url, digest, body=body)
+
+    def get_body(self, digest):
+        body = self.cache.get(("body", digest))
+        if body is None:
+            raise KeyError(f"Page body {digest} is no longer cached")
+        return body
+
+    def parse(self, page, key, parse):
+        """Return ``parse(page)``, reusing the result for identical content.
+
+        ``key`` names the parser, and must change along with what it returns.
+        """
+        cache_key = ("parsed", key, page.hash)
+        result = self.cache.get(cache_key)
+        if result is not None:
+            self.parse_hits += 1
+            self.cache.touch(cache_key, expire=self.ttl)
+            return result
+        result = parse(page)
+        self.parsed += 1
+        self.cache.set(cache_key, result, expire=self.ttl)
+        return result
+
+    def summary(self):
+        return (
+            f"{self.downloaded} pages downloaded ({self.unchanged} unchanged), "
+            f"{self.not_modified} not modified, {self.parsed} parsed, "
+            f"{self.parse_hits} parse results reused"
+        )
+
+    def close(self):
+        self.cache.close()
@@ -0,0 +1,119 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from ..database import get_engine
+from .crawler import CRAWLER_CLASSES
+
+# crawlers run by a full refresh
+CRAWLERS = list(CRAWLER_CLASSES.values())
+
+
+class CrawlResult:
+    def __init__(self, eshop, rows=0, seconds=0.0, error=None, failed_pages=0):
+        self.eshop = eshop
+        self.rows = rows
+        self.seconds = seconds
+        self.error = error
+        # pages skipped after every retry failed, so products are missing
+        self.failed_pages = failed_pages
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def complete(self):
+        return self.ok and not self.failed_pages
+
+    def summary(self):
+        if not self.ok:
+            return f"{self.eshop}: failed after {self.seconds:.1f}s ({self.error})"
+        summary = f"{self.eshop}: {self.rows} products in {self.seconds:.1f}s"
+        if self.failed_pages:
+            summary += f", incomplete: {self.failed_pages} pages failed"
+        return summary
+
+    def __repr__(self):
+        return "<CrawlResult {}>".format(self.summary())
+
+
+def get_crawler(eshop):
+    for crawler_cls in CRAWLERS:
+        if crawler_cls.eshop == eshop:
+            return crawler_cls
+    raise KeyError(f"No crawler for eshop {eshop!r}")
+
+
+def record_run(result, started_at, trigger):
+    """Store a CrawlResult in the crawl_run table, never raising."""
+    try:
+        with get_engine().begin() as conn:
+            conn.execute(
+                text(
+                    """
+                INSERT INTO crawl_run (eshop, trigger, started_at, finished_at, seconds, rows, failed_pages, error)
+                VALUES (:eshop, :trigger, :started_at, now(), :seconds, :rows, :failed_pages, :error);
+                """
+                ),
+                eshop=result.eshop,
+                trigger=trigger,
+                started_at=started_at,
+                seconds=result.seconds,
+                rows=result.rows,
+                failed_pages=result.failed_pages,
+                error=result.error,
+            )
+    except Exception as e:
+        print(f"Exception at recording {result.eshop} run: {e}", file=sys.stderr)
+
+
+def run_crawler(crawler_cls, trigger="manual"):
+    """Crawl a single eshop, saving pages as they arrive, never raising."""
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    crawler = crawler_cls()
+    try:
+        rows = crawler.stream()
+    except Exception as e:
+        print(f"Exception at updating {crawler_cls.eshop}: {e}", file=sys.stderr)
+        result = CrawlResult(
+            crawler_cls.eshop,
+            seconds=time.perf_counter() - start,
+            error=str(e),
+            failed_pages=crawler.failed_pages,
+        )
+    else:
+        result = CrawlResult(
+            crawler_cls.eshop,
+            rows=rows,
+            seconds=time.perf_counter() - start,
+            failed_pages=crawler.failed_pages,
+        )
+    record_run(result, started_at, trigger)
+    return result
+
+
+def run_crawlers(crawlers=None, progress=None):
+    """Run crawlers concurrently, each eshop streamed into the database.
+
+    ``progress(results, total)`` is called after every finished eshop with
+    the results collected so far, in completion order.
+    """
+    crawlers = CRAWLERS if crawlers is None else crawlers
+    results = []
+    if not crawlers:
+        return results
+
+    with ThreadPoolExecutor(max_workers=len(crawlers)) as pool:
+        futures = [pool.submit(run_crawler, crawler) for crawler in crawlers]
+        for future in as_completed(futures):
+            result = future.result()
+            print(result.summary(), flush=True)
+            results.append(result)
+            if progress is not None:
+                progress(results, len(crawlers))
+    return results
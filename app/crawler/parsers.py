@@ -0,0 +1,172 @@
+import io
+
+from lxml import etree, html
+
+from config import Config
+
+
+def normalize_prices(values):
+    """Convert scraped price strings such as ``"12,99&nbsp;€"`` to floats.
+
+    A plain loop over the prices of one page, which at a few dozen prices
+    is faster than pandas ``.str`` methods. Empty prices become None.
+    """
+    prices = []
+    for value in values:
+        value = (
+            value.strip()
+            .replace(",", ".")
+            .replace("&nbsp;", "")
+            .replace("\xa0", "")
+            .replace("€", "")
+        )
+        prices.append(float(value) if value else None)
+    return prices
+
+
+def compile_xpath(path):
+    # plain strings do not keep a reference to their (possibly huge) tree
+    return etree.XPath(path, smart_strings=False)
+
+
+def first(xpath, element):
+    """Return the first result of a compiled ``xpath`` on ``element``, or None."""
+    result = xpath(element)
+    return result[0] if result else None
+
+
+class CardParser:
+    """Parse a listing page with one element per product card.
+
+    The XPath expressions are compiled once. ``url``, ``title`` and
+    ``prices`` are evaluated relative to each card, and the first of the
+    ``prices`` holding a number is used, so a discounted card can fall back
+    to its crossed out price. An incomplete card is skipped when
+    ``skip_incomplete`` is set and raises a ValueError otherwise.
+
+    With a ``stream_card`` test, pages of ``CRAWLER_STREAM_PARSE_BYTES`` or
+    more are parsed incrementally with ``iterparse``, and every card is freed
+    as soon as it has been read. ``stream_card`` is evaluated on every
+    element, or on every ``stream_tag`` element, that has been parsed.
+    """
+
+    def __init__(
+        self,
+        cards,
+        url,
+        title,
+        prices,
+        skip_incomplete=False,
+        stream_card=None,
+        stream_tag=None,
+    ):
+        self.cards = compile_xpath(cards)
+        self.url = compile_xpath(url)
+        self.title = compile_xpath(title)
+        self.prices = [compile_xpath(price) for price in prices]
+        self.skip_incomplete = skip_incomplete
+        self.stream_card = None if stream_card is None else etree.XPath(stream_card)
+        # only elements with this tag are tested with stream_card
+        self.stream_tag = stream_tag
+
+    def __call__(self, body, manufacturer, eshop):
+        titles, urls, prices = [], [], []
+        for card in self.iter_cards(body):
+            url = first(self.url, card)
+            title = first(self.title, card)
+            price = None
+            for xpath in self.prices:
+                price = first(xpath, card)
+                if price is not None and any(char.isdigit() for char in price):
+                    break
+            else:
+                price = None
+
+            if url is None or title is None or price is None:
+                if self.skip_incomplete:
+                    continue
+                raise ValueError(f"Incomplete product card: {title!r} {url!r}")
+            titles.append(title.strip())
+            urls.append(url)
+            prices.append(price)
+
+        return (
+            titles,
+            [manufacturer.capitalize()] * len(titles),
+            [eshop] * len(titles),
+            urls,
+            normalize_prices(prices),
+        )
+
+    def iter_cards(self, body):
+        if self.stream_card is None or len(body) < Config.CRAWLER_STREAM_PARSE_BYTES:
+            yield from self.cards(html.fromstring(body))
+            return
+
+        for _, element in etree.iterparse(
+            io.BytesIO(body), events=("end",), tag=self.stream_tag, html=True
+        ):
+            if not self.stream_card(element):
+                continue
+            yield element
+            # free the card and the cards read before it
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+class ColumnParser:
+    """Parse a listing page by collecting each field over the whole page."""
+
+    def __init__(self, titles, urls, prices):
+        self.titles = compile_xpath(titles)
+        self.urls = compile_xpath(urls)
+        self.prices = compile_xpath(prices)
+
+    def __call__(self, body, manufacturer, eshop):
+        content = html.fromstring(body)
+        titles = self.titles(content)
+        urls = self.urls(content)
+        prices = normalize_prices(self.prices(content))
+        prices = [price for price in prices if price is not None]
+        return (
+            titles,
+            [manufacturer.capitalize()] * len(titles),
+            [eshop] * len(prices),
+            urls,
+            prices,
+        )
+
+
+EUROVAISTINE = CardParser(
+    cards='//div[@class="product-card"]',
+    url='a[@class="product-card--link"]/@href',
+    title='div[@class="right-content"]/div[@class="product-card--title-box"]/div[1]/div[@class="product-card--title"]/text()',
+    prices=[
+        'div[@class="right-content"]/div[@class="product-card--price"]/text()',
+        'div[@class="right-content"]/div[@class="product-card--price"]/s/text()',
+    ],
+)
+
+BENU = CardParser(
+    cards='//div[@class="productsList__wrap"]/div/div',
+    url='div/div[@class="bnProductCard__top"]/a[@class="bnProductCard__title"]/@href',
+    title='div/div[@class="bnProductCard__top"]/a[@class="bnProductCard__title"]/h3/text()',
+    prices=[
+        'div/div[@class="bnProductCard__bottom"]/div[@class="bnProductCard__price "]/span/span/span[1]/text()'
+    ],
+    skip_incomplete=True,
+    # the pageSize/all listing of a manufacturer can be several megabytes
+    stream_card='boolean(parent::div/parent::div[@class="productsList__wrap"])',
+    stream_tag="div",
+)
+
+# one union keeps discounted and regular prices in page order, matching the titles
+HERBA = ColumnParser(
+    titles='//h4[@class="product-name"]/a/text()',
+    urls='//h4[@class="product-name"]/a/@href',
+    prices=(
+        '//span[contains(@id, "product-price") and not(contains(@id, "side")) and @class!="regular-price"]/text()'
+        ' | //span[@class="regular-price" and contains(@id, "product-price") and not(contains(@id, "side"))]/span/text()'
+    ),
+)
@@ -0,0 +1,120 @@
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from config import Config
+
+# statuses worth another attempt, everything else fails right away
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpen(httpx.HTTPError):
+    """Raised instead of requesting a host whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stop requesting a host after ``threshold`` failures in a row.
+
+    Once open, requests fail fast for ``cooldown`` seconds. After that a
+    single trial request is let through while the others keep failing fast:
+    a success closes the breaker, a failure opens it again.
+    """
+
+    def __init__(self, threshold=None, cooldown=None):
+        self.threshold = threshold or Config.CRAWLER_BREAKER_THRESHOLD
+        if cooldown is None:
+            cooldown = Config.CRAWLER_BREAKER_COOLDOWN
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.opened = 0
+        # a trial request of the half open breaker is in flight
+        self.trial = False
+
+    def check(self, host):
+        """Raise CircuitOpen unless a request may go out, True for the trial."""
+        if self.opened_at is None:
+            return False
+        if self.trial or time.monotonic() - self.opened_at < self.cooldown:
+            raise CircuitOpen(f"Circuit breaker for {host} is open")
+        # half open, this request is the trial
+        self.trial = True
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def failure(self):
+        self.failures += 1
+        if self.trial:
+            # the trial failed, open again for another cooldown
+            self.trial = False
+            self.opened_at = time.monotonic()
+            self.opened += 1
+        elif self.failures >= self.threshold and self.opened_at is None:
+            self.opened_at = time.monotonic()
+            self.opened += 1
+
+    def release(self):
+        """Let another request be the trial, when this one ended without an answer."""
+        self.trial = False
+
+
+def is_retryable(exc):
+    if isinstance(exc, CircuitOpen):
+        return False
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRY_STATUSES
+    return isinstance(exc, httpx.TransportError)
+
+
+def retry_after(exc):
+    """Seconds the server asked us to wait with ``Retry-After``, or None."""
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+    value = exc.response.headers.get("retry-after")
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class wait_retry_after(wait_random_exponential):
+    """Exponential backoff with jitter, unless the server sent Retry-After."""
+
+    def __call__(self, retry_state):
+        exc = retry_state.outcome.exception()
+        seconds = retry_after(exc) if exc is not None else None
+        if seconds is not None:
+            return min(seconds, self.max)
+        return super().__call__(retry_state)
+
+
+def retrying(max_attempts=None, before_sleep=None):
+    """Return the tenacity policy used for every crawler request."""
+    return AsyncRetrying(
+        retry=retry_if_exception(is_retryable),
+        stop=stop_after_attempt(max_attempts or Config.CRAWLER_MAX_ATTEMPTS),
+        wait=wait_retry_after(
+            multiplier=Config.CRAWLER_RETRY_BACKOFF, max=Config.CRAWLER_RETRY_MAX_WAIT
+        ),
+        before_sleep=before_sleep,
+        reraise=True,
+    )
@@ -0,0 +1,76 @@
+from . import parsers
+
+
+class CrawlerSpec:
+    """Everything that differs between the eshops, see ``Crawler.from_spec``.
+
+    ``url`` is formatted with ``base_url``, ``manufacturer`` (passed through
+    ``slug`` first, if given) and, for ``pagination="pages"``, ``page``.
+    Numbered pages are crawled until a page has fewer than ``page_size``
+    products, has none, or repeats a product; ``pagination="single"`` fetches
+    one page per manufacturer. ``parser`` turns a page body into product
+    columns, see app/crawler/parsers.py. ``manufacturers`` defaults to every
+    manufacturer we track. ``concurrency`` and ``delay`` cap the parallel
+    requests to the eshop and space out their starts; unset, they default to
+    ``CRAWLER_CONCURRENCY`` and ``CRAWLER_DELAY``, and either can be
+    overridden by eshop with ``CRAWLER_CONCURRENCIES`` and ``CRAWLER_DELAYS``.
+    """
+
+    def __init__(
+        self,
+        eshop,
+        base_url,
+        url,
+        parser,
+        pagination="pages",
+        page_size=None,
+        manufacturers=None,
+        slug=None,
+        concurrency=None,
+        delay=None,
+    ):
+        if pagination not in ("pages", "single"):
+            raise ValueError(f"Unknown pagination {pagination!r}")
+        self.eshop = eshop
+        self.base_url = base_url
+        self.url = url
+        self.parser = parser
+        self.pagination = pagination
+        self.page_size = page_size
+        self.manufacturers = manufacturers
+        self.slug = slug
+        self.concurrency = concurrency
+        self.delay = delay
+
+    def __repr__(self):
+        return "<CrawlerSpec {}>".format(self.eshop)
+
+
+EUROVAISTINE = CrawlerSpec(
+    eshop="Eurovaistine",
+    base_url="https://www.eurovaistine.lt",
+    url="{base_url}/paieska/rezultatai?q={manufacturer}&page={page}",
+    parser=parsers.EUROVAISTINE,
+    page_size=48,
+)
+
+BENU = CrawlerSpec(
+    eshop="Benu",
+    base_url="https://www.benu.lt",
+    url="{base_url}/{manufacturer}?vars/pageSize/all",
+    parser=parsers.BENU,
+    pagination="single",
+    slug=lambda manufacturer: manufacturer.replace(" ", "-"),
+)
+
+HERBA = CrawlerSpec(
+    eshop="Herba",
+    base_url="https://www.herba.lt",
+    url="{base_url}/catalogsearch/result/index/?p={page}&q={manufacturer}",
+    parser=parsers.HERBA,
+    page_size=24,
+    manufacturers=["uriage", "apivita"],
+)
+
+# every eshop we crawl, in the order of a full refresh
+SPECS = [EUROVAISTINE, HERBA, BENU]
@@ -4,56 +4,75 @@ from dash import html
 import dash
 import pandas as pd
 from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
 
 from .dash import Dash
 
-from config import Config
-from sqlalchemy import create_engine
-
-engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
-
-
-def get_products():
-    with engine.connect() as conn:
-        df = pd.read_sql_query(
-            f"""
-            SELECT product.name, product.url, manufacturer.name AS manufacturer, eshop.name AS eshop
-            FROM product
-            INNER JOIN manufacturer ON product.manufacturer_id = manufacturer.id
-            INNER JOIN eshop ON product.eshop_id = eshop.id  
-            """,
-            conn,
-        )
-        df["name"] = df["eshop"] + " " + df["name"]
-        return df
+from ..cache import ResultCache, analogs_version, bump_analogs_version
+from ..database import get_engine
+from ..jobs import ACTIVE_STATUSES, enqueue_matching, get_job
+from ..matching import (
+    accept_candidates,
+    lock_analogs,
+    pending_candidates,
+    reject_candidates,
+)
+from ..search import product_index, search_products
+
+ANALOG_COLUMNS = [
+    "ID",
+    "Product Name 1",
+    "Last Price 1",
+    "Product Name 2",
+    "Last Price 2",
+    "Price Difference",
+]
+
+# kept with every row of the table but not shown
+PRODUCT_ID_COLUMNS = ["product_id_1", "product_id_2"]
+
+CANDIDATE_COLUMNS = ["Product Name 1", "Product Name 2", "Confidence"]
+
+
+# every analog pair with the last known price of both products
+ANALOGS_QUERY = """
+    SELECT analog.id, p1.name AS product_1, latest_1.price, p2.name AS product_2, latest_2.price, ROUND(CAST(FLOAT8 (latest_1.price - latest_2.price) AS NUMERIC), 2) AS pdiff, eshop_1.name AS eshop1, eshop_2.name AS eshop2, p1.id AS product_id_1, p2.id AS product_id_2
+    FROM analog
+    INNER JOIN product AS p1 ON p1.id = analog.product_id_1
+    INNER JOIN product AS p2 ON p2.id = analog.product_id_2
+    INNER JOIN eshop AS eshop_1 ON p1.eshop_id = eshop_1.id
+    INNER JOIN eshop AS eshop_2 ON p2.eshop_id = eshop_2.id
+    LEFT JOIN latest_price AS latest_1 ON p1.id = latest_1.product_id
+    LEFT JOIN latest_price AS latest_2 ON p2.id = latest_2.product_id
+"""
+
+# the edits of one save: the deleted rows and the added ones, which get
+# their IDs from the analog id sequence; returns the IDs of the added rows
+SAVE_ANALOGS = text(
+    """
+    WITH deleted AS (
+        DELETE FROM analog WHERE id = ANY(CAST(:deleted AS integer[]))
+    )
+    INSERT INTO analog (product_id_1, product_id_2)
+    SELECT * FROM unnest(CAST(:ids_1 AS integer[]), CAST(:ids_2 AS integer[]))
+    RETURNING id;
+    """
+)
 
 
-def get_analogs():
-    with engine.connect() as conn:
-        df = pd.read_sql_query(
-            f"""
-            SELECT DISTINCT ON(analog.id) analog.id, p1.name AS product_1, store_1.price, p2.name AS product_2, store_2.price, ROUND(CAST(FLOAT8 (store_1.price - store_2.price) AS NUMERIC), 2) AS pdiff, eshop_1.name AS eshop1, eshop_2.name AS eshop2
-            FROM analog
-            INNER JOIN product AS p1 ON p1.id = analog.product_id_1
-            INNER JOIN product AS p2 ON p2.id = analog.product_id_2
-            INNER JOIN eshop AS eshop_1 ON p1.eshop_id = eshop_1.id
-            INNER JOIN eshop AS eshop_2 ON p2.eshop_id = eshop_2.id
-            LEFT JOIN store AS store_1 ON p1.id = store_1.product_id
-            LEFT JOIN store AS store_2 ON p2.id = store_2.product_id
-			ORDER BY analog.id, store_1.date, store_2.date DESC
-            """,
-            conn,
-        )
-        df.columns = [
-            "ID",
-            "Product Name 1",
-            "Last Price 1",
-            "Product Name 2",
-            "Last Price 2",
-            "Price Difference",
-            "Eshop 1",
-            "Eshop 2",
-        ]
+def get_analogs(ids=None):
+    """Every analog, or only the analogs ``ids``, with their latest prices."""
+    if ids is None:
+        query, params = ANALOGS_QUERY + " ORDER BY analog.id", None
+    else:
+        query = text(ANALOGS_QUERY + " WHERE analog.id IN :ids ORDER BY analog.id")
+        query = query.bindparams(bindparam("ids", expanding=True))
+        params = {"ids": list(ids)}
+    with get_engine().connect() as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+        df.columns = ANALOG_COLUMNS + ["Eshop 1", "Eshop 2"] + PRODUCT_ID_COLUMNS
         df["Product Name 1"] = df["Eshop 1"] + " " + df["Product Name 1"]
         df["Product Name 2"] = df["Eshop 2"] + " " + df["Product Name 2"]
         df.drop(columns=["Eshop 1", "Eshop 2"], inplace=True)
@@ -61,294 +80,498 @@ def get_analogs():
         return df
 
 
-product_names = get_products()["name"].to_list()
-analog_df = get_analogs()
+@ResultCache("analogs", maxsize=2)
+def _saved_analogs(version):
+    return get_analogs().to_dict("records")
 
 
-def add_row(n_clicks, rows, columns):
-    print(f"{n_clicks=}", flush=True)
-    if rows:
-        # getting max id from the list of rows
-        max_id = max([row["ID"] for row in rows])
-    else:
-        max_id = 0
-    if n_clicks > 0:
-        # making a new row
-        new_row = {c["id"]: "" for c in columns}
-        new_row["ID"] = max_id + 1
-        rows.append(new_row)
-    # updating current table in the page
-    update_analog_data(rows)
-    # returning new rows
-    return rows
+def saved_analogs():
+    """The saved analog list, queried once per change for every worker.
+
+    Only read by the page load; the edits of a session stay in its browser
+    stores until they are saved.
+    """
+    return _saved_analogs(analogs_version())
 
 
-def update_analog_data(data):
-    table.data = data
+def saved_ids(rows):
+    """The IDs of the saved rows, which the table is compared to for deletions."""
+    return [row["ID"] for row in rows]
 
 
-def show_removed_rows(previous, current):
-    if previous is None:
-        return dash.no_update
+def search_options(search_value, value):
+    """Offer the products matching the typed text, see app/search.py."""
+    if not search_value:
+        raise PreventUpdate
+    products = search_products(search_value)
+    # the selected product has to stay among the options to remain selected
+    if value and value not in [product_id for product_id, _ in products]:
+        products.append((value, product_index().name(value)))
+    return [{"label": name, "value": product_id} for product_id, name in products]
 
+
+def new_row(n_clicks, product_1, product_2):
+    """A row of the products selected above the table, saved with the next save."""
+    if not n_clicks or not product_1 or not product_2:
+        raise PreventUpdate
+    index = product_index()
+    row = {column: "" for column in ANALOG_COLUMNS}
+    row.update(
+        {
+            "Product Name 1": index.name(product_1),
+            "Product Name 2": index.name(product_2),
+            "product_id_1": product_1,
+            "product_id_2": product_2,
+            # a new value even when the same pair is added twice
+            "key": n_clicks,
+        }
+    )
+    return row
+
+
+def save_analogs(inserts, deletes):
+    """Apply the edits in one statement, returns the IDs of the added rows."""
+    inserts = [row for row in inserts if row["product_id_1"] and row["product_id_2"]]
+    with get_engine().begin() as conn:
+        if inserts:
+            lock_analogs(conn)
+        ids = conn.execute(
+            SAVE_ANALOGS,
+            deleted=list(deletes),
+            ids_1=[row["product_id_1"] for row in inserts],
+            ids_2=[row["product_id_2"] for row in inserts],
+        ).scalars().all()
+        bump_analogs_version(conn)
+    return ids
+
+
+def save_changes(n_clicks, changes):
+    """Save the edits tracked in the browser and send back the saved rows."""
+    if not n_clicks or not changes:
+        raise PreventUpdate
+    try:
+        ids = save_analogs(changes["inserts"], changes["deletes"])
+    except SQLAlchemyError as e:
+        print(f"Exception while saving analogs: {e!r}", flush=True)
+        # the edits stay in the table, to be saved again
+        return dash.no_update, f"Saving failed: {getattr(e, 'orig', e)}"
+    rows = get_analogs(ids).to_dict("records") if ids else []
+    return {"rows": rows, "deleted": changes["deletes"]}, ""
+
+
+# compares the table with the saved rows in the browser, so saving only
+# sends the added and deleted rows; saved rows cannot be edited
+TRACK_CHANGES = """
+function(rows, saved) {
+    const inserts = [];
+    const seen = {};
+    (rows || []).forEach(function(row) {
+        if (row.ID === "" || row.ID === null || row.ID === undefined) {
+            inserts.push({product_id_1: row.product_id_1, product_id_2: row.product_id_2});
+        } else {
+            seen[row.ID] = true;
+        }
+    });
+    const deletes = (saved || []).filter(id => !seen[id]);
+    const count = inserts.length + deletes.length;
+    return [
+        {inserts: inserts, deletes: deletes},
+        count === 0,
+        count ? "Save Data (" + count + ")" : "Save Data",
+    ];
+}
+"""
+
+# adds a new row, or merges rows saved on the server into the table
+MERGE_ROWS = """
+function(newRow, accepted, savedRows, rows, saved) {
+    const noUpdate = window.dash_clientside.no_update;
+    const triggered = window.dash_clientside.callback_context.triggered.map(t => t.prop_id);
+    rows = (rows || []).slice();
+    if (triggered.includes("analog-new-row.data")) {
+        if (!newRow) {
+            return [noUpdate, noUpdate];
+        }
+        rows.push(newRow);
+        return [rows, noUpdate];
+    }
+    const update = triggered.includes("analogs-accepted.data") ? accepted : savedRows;
+    if (!update) {
+        return [noUpdate, noUpdate];
+    }
+    const deleted = update.deleted || [];
+    saved = (saved || []).filter(id => !deleted.includes(id));
+    update.rows.forEach(function(row) {
+        let i = rows.findIndex(r => r.ID === row.ID);
+        if (i < 0) {
+            i = rows.findIndex(r => (r.ID === "" || r.ID === null)
+                && r.product_id_1 === row.product_id_1
+                && r.product_id_2 === row.product_id_2);
+        }
+        if (i < 0) {
+            rows.push(row);
+        } else {
+            rows[i] = row;
+        }
+        if (!saved.includes(row.ID)) {
+            saved.push(row.ID);
+        }
+    });
+    return [rows, saved];
+}
+"""
+
+
+def review_candidates(
+    accept_clicks, reject_clicks, match_clicks, n_intervals, selected, job_id
+):
+    """Accept or reject the selected candidates, or find new ones in the background."""
+    triggered = dash.callback_context.triggered_id
+    accepted = dash.no_update
+    if triggered == "accept-candidates-button":
+        try:
+            ids = accept_candidates(selected or [])
+        except SQLAlchemyError as e:
+            print(f"Exception while accepting candidates: {e!r}", flush=True)
+            return (
+                dash.no_update,
+                dash.no_update,
+                dash.no_update,
+                dash.no_update,
+                f"Accepting failed: {getattr(e, 'orig', e)}",
+                dash.no_update,
+            )
+        # the new analogs are merged into the table
+        if ids:
+            accepted = {"rows": get_analogs(ids).to_dict("records")}
+        status = f"Added {len(ids)} analogs"
+    elif triggered == "reject-candidates-button":
+        status = f"Rejected {reject_candidates(selected or [])} candidates"
     else:
-        list_remove_id = [f"{row['ID']}" for row in previous if row not in current]
-        list_remove_id = [item for item in list_remove_id if item]
-
-        if list_remove_id:
-            with engine.begin() as conn:
-                conn.execute(
-                    f"""
-                DELETE from analog
-                WHERE analog.id IN ({",".join(list_remove_id)})
-                """
-                )
-            update_analog_data(current)
-
-
-def update_analog_table(n_clicks, rows, columns):
-    global analog_df
-    if n_clicks is None or n_clicks < 1:
-        return dash.no_update
-
-    df = pd.DataFrame(rows, columns=[item["name"] for item in columns])
-
-    empty = df[
-        (df["Product Name 1"].str.len() == 0) | (df["Product Name 2"].str.len() == 0)
-    ]
-
-    print(len(df[~df.index.isin(empty.index.to_list())]), flush=True)
-    print(len(df), flush=True)
-
-    with engine.begin() as conn:
-        str_list = [
-            f"({row['ID']}, (SELECT id FROM product WHERE name='{row['Product Name 1'].split(' ', 1)[1]}'), (SELECT id FROM product WHERE name='{row['Product Name 2'].split(' ', 1)[1]}'))"
-            for index, row in df[~df.index.isin(empty.index.to_list())].iterrows()
-        ]
-        conn.execute(
-            f"""
-            WITH inputvalues(id, product_id_1, product_id_2) AS (
-                VALUES {",".join(str_list)}
+        if triggered == "match-button":
+            job = enqueue_matching()
+        elif job_id is None:
+            raise PreventUpdate
+        else:
+            job = get_job(job_id)
+        if job is not None and job["status"] in ACTIVE_STATUSES:
+            return (
+                dash.no_update,
+                dash.no_update,
+                job["id"],
+                False,
+                "Looking for equivalent products",
+                dash.no_update,
             )
-            INSERT INTO analog(id, product_id_1, product_id_2)
-            SELECT d.id, d.product_id_1, d.product_id_2
-            FROM inputvalues as d
-            WHERE d.product_id_1 IS NOT NULL
-            AND d.product_id_2 IS NOT NULL
-            AND d.id IS NOT NULL
-            ON CONFLICT (id)
-                DO UPDATE SET (product_id_1, product_id_2) = (EXCLUDED.product_id_1, EXCLUDED.product_id_2);
-            """
-        )
-
-    analog_df = get_analogs()
-    print(analog_df.head(), flush=True)
-    update_analog_data(analog_df.to_dict("records"))
-    return analog_df.to_dict("records")
-
-
-controls = dbc.Container(
-    [
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        dcc.Dropdown(
-                            id="analog-dropdown-1",
-                            options=[
-                                {"label": item, "value": item} for item in product_names
-                            ],
-                            style={"width": "100%", "color": "black"},
-                            optionHeight=55,
-                        ),
-                    ],
-                ),
-                dbc.Col(
-                    [
-                        dcc.Dropdown(
-                            id="analog-dropdown-2",
-                            options=[
-                                {"label": item, "value": item} for item in product_names
-                            ],
-                            style={
-                                "width": "100%",
-                                "color": "black",
-                            },
-                            optionHeight=55,
-                        ),
-                    ],
-                ),
-            ]
-        ),
-    ],
-)
+        if job is None:
+            status = "The matching job could not be found"
+        elif job["status"] == "failed":
+            status = f"Matching failed: {job['error']}"
+        else:
+            status = " ".join(job["result"]["summary"])
+    return pending_candidates(), [], None, True, status, accepted
+
+
+def make_candidates_table(candidates):
+    return dash_table.DataTable(
+        id="analog-candidates",
+        data=candidates,
+        columns=[{"name": i, "id": i} for i in CANDIDATE_COLUMNS],
+        row_selectable="multi",
+        selected_row_ids=[],
+        style_data={
+            "color": "black",
+            "backgroundColor": "white",
+            "whiteSpace": "normal",
+            "height": "auto",
+            "lineHeight": "15px",
+        },
+        style_header={
+            "backgroundColor": "rgb(210, 210, 210)",
+            "color": "black",
+            "fontWeight": "bold",
+        },
+        style_cell_conditional=[
+            {"if": {"column_id": c}, "textAlign": "left"}
+            for c in ["Product Name 1", "Product Name 2"]
+        ],
+        page_size=10,
+        filter_action="native",
+        sort_action="native",
+        fill_width=False,
+    )
+
 
-table = dash_table.DataTable(
-    id="analog-data",
-    data=get_analogs().to_dict("records"),
-    columns=[
-        {"name": i, "id": i, "presentation": "dropdown"}
-        if i != "ID"
-        else {"name": i, "id": i, "editable": False}
-        for i in analog_df.columns
-    ],
-    dropdown={
-        "Product Name 1": {
-            "options": [{"label": i, "value": i} for i in product_names]
+def make_review(candidates):
+    return dbc.Card(
+        [
+            html.H3(
+                "Suggested Equivalents",
+                style={
+                    "textAlign": "center",
+                    "color": "#40587e",
+                    "margin-top": "10px",
+                    "margin-bottom": "10px",
+                },
+            ),
+            make_candidates_table(candidates),
+            dcc.Store(id="match-job"),
+            dcc.Store(id="analogs-accepted"),
+            dcc.Interval(id="match-poll", interval=1000, disabled=True),
+            html.Div(
+                [
+                    dbc.Button(
+                        "Accept Selected", id="accept-candidates-button", n_clicks=0
+                    ),
+                    dbc.Button(
+                        "Reject Selected",
+                        id="reject-candidates-button",
+                        n_clicks=0,
+                        style={"margin-left": "5px"},
+                    ),
+                    dbc.Button(
+                        "Find Matches",
+                        id="match-button",
+                        n_clicks=0,
+                        style={"margin-left": "40%"},
+                    ),
+                ],
+                style={"margin-top": "5px", "margin-bottom": "5px"},
+            ),
+            html.P(id="match-status"),
+        ],
+    )
+
+
+def make_controls():
+    # the options are searched on the server as the user types
+    return dbc.Container(
+        [
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dcc.Dropdown(
+                                id="analog-dropdown-1",
+                                options=[],
+                                placeholder="Search product 1",
+                                style={"width": "100%", "color": "black"},
+                                optionHeight=55,
+                            ),
+                        ],
+                    ),
+                    dbc.Col(
+                        [
+                            dcc.Dropdown(
+                                id="analog-dropdown-2",
+                                options=[],
+                                placeholder="Search product 2",
+                                style={
+                                    "width": "100%",
+                                    "color": "black",
+                                },
+                                optionHeight=55,
+                            ),
+                        ],
+                    ),
+                ]
+            ),
+        ],
+    )
+
+
+def make_table(data):
+    # rows are added from the product search above the table
+    return dash_table.DataTable(
+        id="analog-data",
+        data=data,
+        columns=[{"name": i, "id": i} for i in ANALOG_COLUMNS],
+        row_deletable=True,
+        style_data={
+            "color": "black",
+            "backgroundColor": "white",
+            'whiteSpace': 'normal',
+            'height': 'auto',
+            'lineHeight': '15px'
         },
-        "Product Name 2": {
-            "options": [{"label": i, "value": i} for i in product_names]
+        style_table={"height": 400},
+        style_data_conditional=[
+            {
+                "if": {"row_index": "odd"},
+                "backgroundColor": "rgb(220, 220, 220)",
+            }
+        ],
+        style_header={
+            "backgroundColor": "rgb(210, 210, 210)",
+            "color": "black",
+            "fontWeight": "bold",
         },
-    },
-    editable=True,
-    row_deletable=True,
-    style_data={
-        "color": "black",
-        "backgroundColor": "white",
-        'whiteSpace': 'normal',
-        'height': 'auto',
-        'lineHeight': '15px'
-    },
-    style_table={"height": 400},
-    style_data_conditional=[
-        {
-            "if": {"row_index": "odd"},
-            "backgroundColor": "rgb(220, 220, 220)",
-        }
-    ],
-    style_header={
-        "backgroundColor": "rgb(210, 210, 210)",
-        "color": "black",
-        "fontWeight": "bold",
-    },
-    style_cell_conditional=[
-        {"if": {"column_id": c}, "textAlign": "left"}
-        for c in ["Product Name 1", "Product Name 2"]
-    ] +
-    [{"if": {"column_id": "ID"}, "maxWidth": 30},
-     {"if": {"column_id": "Last Price 1"}, "maxWidth": 120},
-     {"if": {"column_id": "Last Price 2"}, "maxWidth": 120},
-     {"if": {"column_id": "Price Difference"}, "maxWidth": 150},],
-    css=[
-        {
-            "selector": ".Select-menu-outer",
-            "rule": "display: block !important",
-        }
-    ],
-    page_size=10,
-    filter_action="native",
-    sort_action="native",
-    fill_width=False,
-    # virtualization=True,
-)
+        style_cell_conditional=[
+            {"if": {"column_id": c}, "textAlign": "left"}
+            for c in ["Product Name 1", "Product Name 2"]
+        ] +
+        [{"if": {"column_id": "ID"}, "maxWidth": 30},
+         {"if": {"column_id": "Last Price 1"}, "maxWidth": 120},
+         {"if": {"column_id": "Last Price 2"}, "maxWidth": 120},
+         {"if": {"column_id": "Price Difference"}, "maxWidth": 150},],
+        page_size=10,
+        filter_action="native",
+        sort_action="native",
+        fill_width=False,
+        # virtualization=True,
+    )
 
 
-app_layout = dbc.Container(
-    [
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        html.H1(
-                            "Product Comparison Tool",
-                            style={"textAlign": "center"},
-                        ),
-                    ],
-                    md=12,
-                )
-            ],
-            justify="center",
-        ),
-        html.Hr(),
-        html.Hr(),
-        html.Hr(),
-        html.P(id="placeholder5"),
-        dbc.Card(
-            [
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            [
-                                html.H3(
-                                    "Equivalent Products",
-                                    style={
-                                        "textAlign": "center",
-                                        "color": "#40587e",
-                                        "margin-top": "10px",
-                                        "margin-bottom": "10px",
-                                    },
-                                ),
-                            ],
-                            md=12,
-                        )
-                    ],
-                    justify="center",
-                ),
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            [
-                                table,
-                                dcc.Store(id="store-data"),
-                                dcc.Store(id="list-remove-id"),
-                                dbc.Button(
-                                    "Add Row",
-                                    id="editing-rows-button",
-                                    n_clicks=0,
-                                    style={
-                                        "margin-top": "5px",
-                                        "margin-bottom": "5px",
-                                    },
-                                ),
-                                dbc.Button(
-                                    "Save Data",
-                                    id="save-data-button",
-                                    n_clicks=0,
-                                    style={
-                                        "margin-top": "5px",
-                                        "margin-bottom": "5px",
-                                        "margin-left": "40%",
-                                    },
-                                ),
-                            ],
-                            md=12,
-                        ),
-                    ],
-                    justify="center",
-                ),
-            ],
-        ),
-        html.Hr(),
-        html.Hr(),
-    ],
-    fluid=True,
-)
+def make_layout(data, candidates):
+    return dbc.Container(
+        [
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            html.H1(
+                                "Product Comparison Tool",
+                                style={"textAlign": "center"},
+                            ),
+                        ],
+                        md=12,
+                    )
+                ],
+                justify="center",
+            ),
+            html.Hr(),
+            html.Hr(),
+            html.Hr(),
+            dbc.Card(
+                [
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    html.H3(
+                                        "Equivalent Products",
+                                        style={
+                                            "textAlign": "center",
+                                            "color": "#40587e",
+                                            "margin-top": "10px",
+                                            "margin-bottom": "10px",
+                                        },
+                                    ),
+                                ],
+                                md=12,
+                            )
+                        ],
+                        justify="center",
+                    ),
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    make_controls(),
+                                    make_table(data),
+                                    dcc.Store(id="analog-saved", data=saved_ids(data)),
+                                    dcc.Store(id="analog-changes"),
+                                    dcc.Store(id="analog-new-row"),
+                                    dcc.Store(id="analog-saved-rows"),
+                                    dbc.Button(
+                                        "Add Row",
+                                        id="editing-rows-button",
+                                        n_clicks=0,
+                                        style={
+                                            "margin-top": "5px",
+                                            "margin-bottom": "5px",
+                                        },
+                                    ),
+                                    dbc.Button(
+                                        "Save Data",
+                                        id="save-data-button",
+                                        n_clicks=0,
+                                        disabled=True,
+                                        style={
+                                            "margin-top": "5px",
+                                            "margin-bottom": "5px",
+                                            "margin-left": "40%",
+                                        },
+                                    ),
+                                    html.P(id="save-status"),
+                                ],
+                                md=12,
+                            ),
+                        ],
+                        justify="center",
+                    ),
+                ],
+            ),
+            html.Hr(),
+            make_review(candidates),
+            html.Hr(),
+            html.Hr(),
+        ],
+        fluid=True,
+    )
 
 
 def init_callbacks(dash_app):
 
+    for dropdown in ("analog-dropdown-1", "analog-dropdown-2"):
+        dash_app.callback(
+            Output(dropdown, "options"),
+            Input(dropdown, "search_value"),
+            State(dropdown, "value"),
+        )(search_options)
+
     dash_app.callback(
-        Output("analog-data", "data"),
+        Output("analog-new-row", "data"),
         Input("editing-rows-button", "n_clicks"),
+        State("analog-dropdown-1", "value"),
+        State("analog-dropdown-2", "value"),
+        prevent_initial_call=True,
+    )(new_row)
+
+    dash_app.clientside_callback(
+        MERGE_ROWS,
+        Output("analog-data", "data"),
+        Output("analog-saved", "data"),
+        Input("analog-new-row", "data"),
+        Input("analogs-accepted", "data"),
+        Input("analog-saved-rows", "data"),
         State("analog-data", "data"),
-        State("analog-data", "columns"),
-    )(add_row)
+        State("analog-saved", "data"),
+        prevent_initial_call=True,
+    )
+
+    dash_app.clientside_callback(
+        TRACK_CHANGES,
+        Output("analog-changes", "data"),
+        Output("save-data-button", "disabled"),
+        Output("save-data-button", "children"),
+        Input("analog-data", "data"),
+        Input("analog-saved", "data"),
+    )
 
     dash_app.callback(
-        Output("store-data", "data"),
+        Output("analog-saved-rows", "data"),
+        Output("save-status", "children"),
         Input("save-data-button", "n_clicks"),
-        State("analog-data", "data"),
-        State("analog-data", "columns"),
-    )(update_analog_table)
-    
-    # dash_app.callback(Output("analog-data", "data"),
-    #                   Input("store-data", "data"))(update_analog_data)
+        State("analog-changes", "data"),
+        prevent_initial_call=True,
+    )(save_changes)
 
     dash_app.callback(
-        Output("placeholder5", "value"),
-        Input("analog-data", "data_previous"),
-        State("analog-data", "data"),
-    )(show_removed_rows)
+        Output("analog-candidates", "data"),
+        Output("analog-candidates", "selected_row_ids"),
+        Output("match-job", "data"),
+        Output("match-poll", "disabled"),
+        Output("match-status", "children"),
+        Output("analogs-accepted", "data"),
+        Input("accept-candidates-button", "n_clicks"),
+        Input("reject-candidates-button", "n_clicks"),
+        Input("match-button", "n_clicks"),
+        Input("match-poll", "n_intervals"),
+        State("analog-candidates", "selected_row_ids"),
+        State("match-job", "data"),
+        prevent_initial_call=True,
+    )(review_candidates)
 
     return dash_app
 
@@ -361,8 +584,11 @@ def init_dash(server):
         routes_pathname_prefix="/analogs/",
     )
 
-    # create dash layout
-    dash_app.layout = app_layout
+    # create dash layout, its data is loaded on the first page load
+    dash_app.set_lazy_layout(
+        make_layout([], []),
+        lambda: make_layout(saved_analogs(), pending_candidates()),
+    )
 
     # initialize callbacks
     init_callbacks(dash_app)
@@ -1,4 +1,5 @@
 import dash
+import flask
 from markupsafe import Markup
 from flask import render_template
 
@@ -30,3 +31,21 @@ class Dash(dash.Dash):
             app_entry=Markup(app_entry),
             renderer=Markup(renderer),
         )
+
+    def set_lazy_layout(self, skeleton, factory):
+        """Serve ``factory()`` on page loads and ``skeleton`` everywhere else.
+
+        Dash evaluates function layouts when they are assigned and again on
+        the first request to the server, whichever app it is for. Returning
+        the data-free skeleton there keeps app creation and unrelated first
+        requests from querying the database.
+        """
+        layout_path = self.config.routes_pathname_prefix + "_dash-layout"
+
+        def serve_layout():
+            if flask.has_request_context() and flask.request.path == layout_path:
+                return factory()
+            return skeleton
+
+        self.validation_layout = skeleton
+        self.layout = serve_layout
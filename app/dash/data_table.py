@@ -1,3 +1,6 @@
+import math
+import re
+
 import dash_bootstrap_components as dbc
 from dash import dcc
 from dash import html, dash_table
@@ -7,33 +10,179 @@ import plotly.express as px
 from dash.dependencies import Input, Output
 from .dash import Dash
 
-from config import Config
-from sqlalchemy import create_engine
+from sqlalchemy import text
+
+from ..cache import ResultCache
+from ..database import get_engine
+
+PRODUCT_COLUMNS = ["Product Name", "Eshop", "Last Price", "URL", "Date"]
+NUMERIC_COLUMNS = ["Last Price"]
+TEXT_COLUMNS = ["Product Name", "Eshop", "URL"]
+
+# the expression behind each column; filtering and sorting on the columns
+# themselves, not on a subquery, lets the planner use their indexes, such as
+# the trigram index on product.name
+COLUMN_EXPRESSIONS = {
+    "Product Name": "product.name",
+    "Eshop": "eshop.name",
+    "Last Price": "latest_price.price",
+    "URL": "product.url",
+    "Date": "latest_price.last_seen::date",
+}
+
+PRODUCTS_FROM = """
+    FROM product
+    INNER JOIN eshop ON product.eshop_id = eshop.id
+    LEFT JOIN latest_price ON product.id = latest_price.product_id
+"""
+
+# every product with its last known price, one row per product
+PRODUCTS_QUERY = (
+    """
+    SELECT product.id, product.name AS "Product Name", eshop.name AS "Eshop", latest_price.price AS "Last Price", product.url AS "URL", latest_price.last_seen::date AS "Date"
+"""
+    + PRODUCTS_FROM
+)
+
+COMPARISON_OPERATORS = {
+    "eq": "=",
+    "=": "=",
+    "ne": "<>",
+    "!=": "<>",
+    "lt": "<",
+    "<": "<",
+    "le": "<=",
+    "<=": "<=",
+    "gt": ">",
+    ">": ">",
+    "ge": ">=",
+    ">=": ">=",
+}
+
+FILTER_PART = re.compile(
+    r"^\{(?P<column>[^}]+)\}\s+(?P<operator>\S+)\s+(?P<value>.+)$"
+)
+
+
+def split_filter_part(filter_part):
+    """Split one Dash filter expression, e.g. ``{Eshop} icontains "benu"``."""
+    match = FILTER_PART.match(filter_part.strip())
+    if match is None:
+        return None, None, None
+    column, operator, value = match.groups()
+    value = value.strip()
+    if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"`":
+        value = value[1:-1].replace("\\" + value[0], value[0])
+    return column, operator, value
+
+
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
 
-engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+def build_filters(filter_query):
+    """Translate a Dash table filter query into a parameterized SQL condition.
 
+    Only the table's own columns are accepted, unknown columns, operators
+    and values that do not fit the column type are ignored.
+    """
+    clauses = []
+    params = {}
+    for i, part in enumerate((filter_query or "").split(" && ")):
+        column, operator, value = split_filter_part(part)
+        if column not in PRODUCT_COLUMNS:
+            continue
 
-def get_products():
-    with engine.connect() as conn:
+        # case insensitive operators are prefixed with i, sensitive with s
+        insensitive = False
+        if operator[:1] in ("i", "s") and (
+            operator[1:] in COMPARISON_OPERATORS or operator[1:] == "contains"
+        ):
+            insensitive = operator[0] == "i"
+            operator = operator[1:]
+
+        name = f"filter_{i}"
+        expression = COLUMN_EXPRESSIONS[column]
+        if column not in TEXT_COLUMNS:
+            text_expression = f"CAST({expression} AS text)"
+        else:
+            text_expression = expression
+        if operator == "contains":
+            like = "ILIKE" if insensitive else "LIKE"
+            clauses.append(f"{text_expression} {like} :{name}")
+            params[name] = f"%{escape_like(value)}%"
+        elif operator == "datestartswith":
+            clauses.append(f"{text_expression} LIKE :{name}")
+            params[name] = f"{escape_like(value)}%"
+        elif operator in ("eq", "=") and insensitive and column in TEXT_COLUMNS:
+            # ILIKE without wildcards, which the trigram index can serve
+            clauses.append(f"{expression} ILIKE :{name}")
+            params[name] = escape_like(value)
+        elif operator in COMPARISON_OPERATORS:
+            sql_operator = COMPARISON_OPERATORS[operator]
+            if column in NUMERIC_COLUMNS:
+                try:
+                    params[name] = float(value)
+                except ValueError:
+                    continue
+                clauses.append(f"{expression} {sql_operator} :{name}")
+            elif insensitive:
+                clauses.append(f"lower({text_expression}) {sql_operator} lower(:{name})")
+                params[name] = value
+            else:
+                clauses.append(f"{text_expression} {sql_operator} :{name}")
+                params[name] = value
+    return " AND ".join(clauses) or "TRUE", params
+
+
+def build_order_by(sort_by):
+    order_by = [
+        f'{COLUMN_EXPRESSIONS[item["column_id"]]} {item["direction"].upper()} NULLS LAST'
+        for item in sort_by or []
+        if item["column_id"] in PRODUCT_COLUMNS
+        and item["direction"] in ("asc", "desc")
+    ]
+    # product id keeps the order stable between pages
+    return ", ".join(order_by + ["product.id"])
+
+
+@ResultCache("data-table-count")
+def count_products(filter_query):
+    """The number of products matching ``filter_query``, counted once per data version.
+
+    Paging through the results then no longer counts every matching row again.
+    """
+    where, params = build_filters(filter_query)
+    with get_engine().connect() as conn:
+        return conn.execute(
+            text(f"SELECT count(*) {PRODUCTS_FROM} WHERE {where}"), params
+        ).scalar()
+
+
+def get_products(page_current=0, page_size=16, filter_query="", sort_by=None):
+    """Return one page of products and the number of products matching."""
+    where, params = build_filters(filter_query)
+    total = count_products(filter_query or "")
+    with get_engine().connect() as conn:
         df = pd.read_sql_query(
-            f"""
-            SELECT DISTINCT ON (product.id) product.name, product.url, manufacturer.name AS manufacturer, eshop.name AS eshop, store.price, date::date
-            FROM product
-            INNER JOIN manufacturer ON product.manufacturer_id = manufacturer.id
-            INNER JOIN eshop ON product.eshop_id = eshop.id
-            LEFT JOIN store ON product.id = store.product_id
-            ORDER BY product.id, date DESC
-            """,
+            text(
+                f"""
+            {PRODUCTS_QUERY}
+            WHERE {where}
+            ORDER BY {build_order_by(sort_by)}
+            LIMIT :limit OFFSET :offset
+            """
+            ),
             conn,
+            params={**params, "limit": page_size, "offset": page_current * page_size},
         )
-        df = df.drop("manufacturer", axis=1)
-        df.columns = ["Product Name", "URL", "Eshop", "Last Price", "Date"]
-        df = df[["Product Name", "Eshop", "Last Price", "URL", "Date"]]
-        return df
+        return df[PRODUCT_COLUMNS], total
 
 
-product_names = get_products()
+def update_table(page_current, page_size, filter_query, sort_by):
+    df, total = get_products(page_current or 0, page_size, filter_query, sort_by)
+    page_count = max(1, math.ceil(total / page_size))
+    return df.to_dict("records"), page_count, f"{total} products"
 
 
 controls = dbc.Container(
@@ -41,68 +190,85 @@ controls = dbc.Container(
 )
 
 
-table = dash_table.DataTable(
-    id="analog-data",
-    data=product_names.to_dict("records"),
-    columns=[{"name": i, "id": i} for i in product_names.columns],
-    style_data={
-        "color": "black",
-        "backgroundColor": "white",
-        "height": "auto",
-        "whiteSpace": "normal",
-    },
-    style_table={"height": 800},
-    style_data_conditional=[
-        {
-            "if": {"row_index": "odd"},
-            "backgroundColor": "rgb(220, 220, 220)",
-        }
-    ],
-    style_header={
-        "backgroundColor": "rgb(210, 210, 210)",
-        "color": "black",
-        "fontWeight": "bold",
-    },
-    style_cell_conditional=[
-        {"if": {"column_id": c}, "textAlign": "left"} for c in product_names.columns
-    ],
-    css=[
-        {
-            "selector": ".Select-menu-outer",
-            "rule": "display: block !important",
-        }
-    ],
-    page_size=16,
-    filter_action="native",
-    sort_action="native",
-)
+def make_table():
+    return dash_table.DataTable(
+        id="analog-data",
+        data=[],
+        columns=[
+            {"name": i, "id": i, "type": "numeric"}
+            if i in NUMERIC_COLUMNS
+            else {"name": i, "id": i}
+            for i in PRODUCT_COLUMNS
+        ],
+        style_data={
+            "color": "black",
+            "backgroundColor": "white",
+            "height": "auto",
+            "whiteSpace": "normal",
+        },
+        style_table={"height": 800},
+        style_data_conditional=[
+            {
+                "if": {"row_index": "odd"},
+                "backgroundColor": "rgb(220, 220, 220)",
+            }
+        ],
+        style_header={
+            "backgroundColor": "rgb(210, 210, 210)",
+            "color": "black",
+            "fontWeight": "bold",
+        },
+        style_cell_conditional=[
+            {"if": {"column_id": c}, "textAlign": "left"} for c in PRODUCT_COLUMNS
+        ],
+        css=[
+            {
+                "selector": ".Select-menu-outer",
+                "rule": "display: block !important",
+            }
+        ],
+        # paging, filtering and sorting are done in SQL by update_table
+        page_current=0,
+        page_size=16,
+        page_action="custom",
+        filter_action="custom",
+        filter_query="",
+        filter_options={"case": "insensitive"},
+        sort_action="custom",
+        sort_by=[],
+    )
 
-app_layout = dbc.Container(
-    [
-        html.Hr(),
-        html.H2("Product Search", style={"textAlign": "center"}),
-        html.Hr(),
-        dbc.Card(
-            [
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            [table],
-                            md=10,
-                        ),
-                    ],
-                    justify="center",
-                ),
-            ]
-        ),
-        html.Hr(),
-    ],
-    fluid=True,
-)
+
+def make_layout():
+    return dbc.Container(
+        [
+            html.Hr(),
+            html.H2("Product Search", style={"textAlign": "center"}),
+            html.Hr(),
+            dbc.Card(
+                [
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    html.Div(id="product-count"),
+                                    make_table(),
+                                ],
+                                md=10,
+                            ),
+                        ],
+                        justify="center",
+                    ),
+                ]
+            ),
+            html.Hr(),
+        ],
+        fluid=True,
+    )
 
 
 def make_graph_1(manufacturers, eshops, value):
-    with engine.connect() as conn:
+    with get_engine().connect() as conn:
         df = pd.read_sql_query(
             f"""
             SELECT product.id, product.name, store.price, to_char(store.date, 'YYYY-mm-dd') AS date, eshop.name AS e_name, manufacturer.name AS m_name
@@ -148,7 +314,15 @@ def make_graph_1(manufacturers, eshops, value):
 
 def init_callbacks(dash_app):
 
-    # dash_app.callback()()
+    dash_app.callback(
+        Output("analog-data", "data"),
+        Output("analog-data", "page_count"),
+        Output("product-count", "children"),
+        Input("analog-data", "page_current"),
+        Input("analog-data", "page_size"),
+        Input("analog-data", "filter_query"),
+        Input("analog-data", "sort_by"),
+    )(update_table)
 
     return dash_app
 
@@ -157,8 +331,8 @@ def init_dash(server):
     """Create a Plotly Dash dashboard."""
     dash_app = Dash(server=server, routes_pathname_prefix="/data-table/")
 
-    # create dash layout
-    dash_app.layout = app_layout
+    # create dash layout, the table loads its rows page by page
+    dash_app.layout = make_layout()
 
     # initialize callbacks
     init_callbacks(dash_app)
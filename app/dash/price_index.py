@@ -1,21 +1,36 @@
+import itertools
+import json
+import time
+
 import dash_bootstrap_components as dbc
 from dash import dcc
 from dash import html
 import dash
 import pandas as pd
-import plotly.express as px
-from dash.dependencies import Input, Output
+import plotly.graph_objects as go
+import plotly.io as pio
+from dash.dependencies import Input, Output, State
 from .dash import Dash
 
-from config import Config
-from sqlalchemy import create_engine
-from ..crawler.crawler import (
-    CrawlerEurovaistine,
-    CrawlerBenu,
-    CrawlerHerba,
-)
+from sqlalchemy import bindparam, text
+
+from ..cache import ResultCache, on_new_data, shared_cache
+from ..crawler.specs import SPECS
+from ..database import get_engine
+from ..jobs import ACTIVE_STATUSES, enqueue_crawl, get_job
+
+# the choices offered by the checklists and dropdowns
+ESHOPS = [spec.eshop for spec in SPECS]
+MANUFACTURERS = [
+    "Uriage",
+    "Bioderma",
+    "Filorga",
+    "Vichy",
+    "La Roche-Posay",
+    "Svr",
+    "Apivita",
+]
 
-engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
 
 controls = dbc.Card(
     [
@@ -23,18 +38,7 @@ controls = dbc.Card(
             [
                 dbc.Label("Manufacturer Selection", color="#40587e"),
                 dbc.Checklist(
-                    options=[
-                        {"label": item, "value": item}
-                        for item in [
-                            "Uriage",
-                            "Bioderma",
-                            "Filorga",
-                            "Vichy",
-                            "La Roche-Posay",
-                            "Svr",
-                            "Apivita",
-                        ]
-                    ],
+                    options=[{"label": item, "value": item} for item in MANUFACTURERS],
                     id="checklist-1",
                 ),
             ]
@@ -50,10 +54,7 @@ graph_1 = dbc.Col(
             children=[
                 dbc.Select(
                     placeholder="Select an E-shop",
-                    options=[
-                        {"label": item, "value": item}
-                        for item in ["Herba", "Eurovaistine", "Benu", "Gintarine"]
-                    ],
+                    options=[{"label": item, "value": item} for item in ESHOPS],
                     id="dropdown-1",
                     class_name="mb-2 col-lg-2 offset-lg-4",
                 )
@@ -70,18 +71,7 @@ graph_2 = dbc.Col(
             children=[
                 dbc.Select(
                     placeholder="Select an Manufacturer",
-                    options=[
-                        {"label": item, "value": item}
-                        for item in [
-                            "Uriage",
-                            "Bioderma",
-                            "Filorga",
-                            "Vichy",
-                            "La Roche-Posay",
-                            "Svr",
-                            "Apivita",
-                        ]
-                    ],
+                    options=[{"label": item, "value": item} for item in MANUFACTURERS],
                     id="dropdown-2",
                     class_name="mb-2 col-lg-2 offset-lg-4",
                 )
@@ -99,10 +89,7 @@ controls2 = dbc.Card(
             [
                 dbc.Label("Eshop Selection", color="#40587e"),
                 dbc.Checklist(
-                    options=[
-                        {"label": item, "value": item}
-                        for item in ["Herba", "Eurovaistine", "Benu", "Gintarine"]
-                    ],
+                    options=[{"label": item, "value": item} for item in ESHOPS],
                     id="checklist-2",
                 ),
             ]
@@ -142,6 +129,25 @@ app_layout = dbc.Container(
             ],
             justify="center",
         ),
+        dbc.Row(
+            [
+                dbc.Col(
+                    [
+                        dbc.Progress(
+                            id="update-progress",
+                            value=0,
+                            striped=True,
+                            animated=True,
+                            style={"visibility": "hidden"},
+                        ),
+                        html.Div(id="update-status"),
+                        dcc.Store(id="update-job"),
+                        dcc.Interval(id="update-poll", interval=1000, disabled=True),
+                    ],
+                    md=12,
+                ),
+            ],
+        ),
         html.P(id="placeholder3"),
         html.Hr(),
         html.Hr(),
@@ -196,130 +202,234 @@ app_layout = dbc.Container(
 )
 
 
-def make_graph_1(manufacturers, eshop, value):
-    if not (manufacturers and eshop):
-        return dash.no_update
-
-    with engine.connect() as conn:
-        df = pd.read_sql_query(
-            f"""
-            SELECT product.id, product.name, store.price, to_char(store.date, 'YYYY-mm-dd') AS date, eshop.name AS e_name, manufacturer.name AS m_name
-            FROM store
-            INNER JOIN product ON store.product_id=product.id
-            INNER JOIN manufacturer ON product.manufacturer_id=manufacturer.id
-            INNER JOIN eshop ON product.eshop_id=eshop.id
-            WHERE eshop.name = '{eshop}'
-            AND manufacturer.name IN ({', '.join(f"'{w}'" for w in manufacturers)})
-            ORDER BY date ASC;
-            """,
+@ResultCache("price-index-eshop")
+def query_eshop_prices(eshop, manufacturers):
+    """Daily mean prices of the ``manufacturers`` in one eshop."""
+    with get_engine().connect() as conn:
+        return pd.read_sql_query(
+            text(
+                """
+            SELECT to_char(price_daily.date, 'YYYY-mm-dd') AS date, price_daily.price_mean AS price, manufacturer.name AS m_name
+            FROM price_daily
+            INNER JOIN manufacturer ON price_daily.manufacturer_id=manufacturer.id
+            INNER JOIN eshop ON price_daily.eshop_id=eshop.id
+            WHERE eshop.name = :eshop
+            AND manufacturer.name IN :manufacturers
+            ORDER BY price_daily.date ASC, manufacturer.name ASC;
+            """
+            ).bindparams(bindparam("manufacturers", expanding=True)),
             conn,
+            params={"eshop": eshop, "manufacturers": list(manufacturers)},
         )
-        df = df.groupby(["date", "m_name"]).price.mean().reset_index()
-
-        fig = px.line(df, x="date", y="price", color="m_name", markers=True, height=600)
-        fig.update_layout(
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            yaxis=dict(color="#003f5c"),
-            xaxis=dict(color="#003f5c"),
-            xaxis_title="Date",
-            yaxis_title="Price (€)",
-            legend_title="Manufacturer",
-            font=dict(size=14, color="#7a5195"),
-        )
-        fig.update_traces(line=dict(width=3))
-        fig.update_yaxes(
-            title_font_color="#ef5675",
-            linecolor="black",
-            linewidth=2,
-            gridcolor="orange",
-        )
-        fig.update_xaxes(
-            title_font_color="#ef5675",
-            linecolor="black",
-            linewidth=2,
-            gridcolor="#ffa600",
+
+
+@ResultCache("price-index-manufacturer")
+def query_manufacturer_prices(manufacturer, eshops):
+    """Daily mean prices of one manufacturer in each of the ``eshops``."""
+    with get_engine().connect() as conn:
+        return pd.read_sql_query(
+            text(
+                """
+            SELECT to_char(price_daily.date, 'YYYY-mm-dd') AS date, price_daily.price_mean AS price, eshop.name AS e_name
+            FROM price_daily
+            INNER JOIN manufacturer ON price_daily.manufacturer_id=manufacturer.id
+            INNER JOIN eshop ON price_daily.eshop_id=eshop.id
+            WHERE eshop.name IN :eshops
+            AND manufacturer.name = :manufacturer
+            ORDER BY price_daily.date ASC, eshop.name ASC;
+            """
+            ).bindparams(bindparam("eshops", expanding=True)),
+            conn,
+            params={"eshops": list(eshops), "manufacturer": manufacturer},
         )
 
-        return fig
 
+# layout shared by both graphs, built once so a render only adds the traces
+FIGURE_LAYOUT = (
+    go.Figure()
+    .update_layout(
+        height=600,
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        yaxis=dict(color="#003f5c"),
+        xaxis=dict(color="#003f5c"),
+        xaxis_title="Date",
+        yaxis_title="Price (€)",
+        font=dict(size=14, color="#7a5195"),
+    )
+    .update_yaxes(
+        title_font_color="#ef5675",
+        linecolor="black",
+        linewidth=2,
+        gridcolor="orange",
+    )
+    .update_xaxes(
+        title_font_color="#ef5675",
+        linecolor="black",
+        linewidth=2,
+        gridcolor="#ffa600",
+    )
+    .to_plotly_json()["layout"]
+)
 
-def make_graph_2(eshops, manufacturer, value):
-    if not (manufacturer and eshops):
-        return dash.no_update
 
-    print(f"{manufacturer=}", flush=True)
-    print(f"{eshops=}", flush=True)
-
-    with engine.connect() as conn:
-        df = pd.read_sql_query(
-            f"""
-            SELECT product.id, product.name, store.price, to_char(store.date, 'YYYY-mm-dd') AS date, eshop.name AS e_name, manufacturer.name AS m_name
-            FROM store
-            INNER JOIN product ON store.product_id=product.id
-            INNER JOIN manufacturer ON product.manufacturer_id=manufacturer.id
-            INNER JOIN eshop ON product.eshop_id=eshop.id
-            WHERE eshop.name IN ({', '.join(f"'{w}'" for w in eshops)})
-            AND manufacturer.name ='{manufacturer}'
-            ORDER BY date ASC;
-            """,
-            conn,
-        )
-        df = df.groupby(["date", "e_name"]).price.mean().reset_index()
-
-        fig = px.line(df, x="date", y="price", color="e_name", markers=True, height=600)
-        fig.update_layout(
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            yaxis=dict(color="#003f5c"),
-            xaxis=dict(color="#003f5c"),
-            xaxis_title="Date",
-            yaxis_title="Price (€)",
-            legend_title="Eshop",
-            font=dict(size=14, color="#7a5195"),
-        )
-        fig.update_traces(line=dict(width=3))
-        fig.update_yaxes(
-            title_font_color="#ef5675",
-            linecolor="black",
-            linewidth=2,
-            gridcolor="orange",
-        )
-        fig.update_xaxes(
-            title_font_color="#ef5675",
-            linecolor="black",
-            linewidth=2,
-            gridcolor="#ffa600",
-        )
+def render_figure(df, color, legend_title, label=None, start=None):
+    """Serialize one line per ``color`` group of ``df`` as figure json.
+
+    With a ``label``, the time spent in each phase is printed; ``start`` is
+    when the query began.
+    """
+    queried = time.perf_counter()
+    series = [
+        (name, group["date"].to_list(), group["price"].to_list())
+        for name, group in df.groupby(color, sort=False)
+    ]
+    aggregated = time.perf_counter()
+    figure = {
+        "data": [
+            {
+                "type": "scatter",
+                "mode": "lines+markers",
+                "name": name,
+                "legendgroup": name,
+                "x": x,
+                "y": y,
+                "line": {"width": 3},
+                "hovertemplate": f"{legend_title}={name}<br>Date=%{{x}}<br>Price (€)=%{{y}}<extra></extra>",
+            }
+            for name, x, y in series
+        ],
+        "layout": {**FIGURE_LAYOUT, "legend": {"title": {"text": legend_title}}},
+    }
+    built = time.perf_counter()
+    payload = pio.to_json(figure, validate=False)
+    serialized = time.perf_counter()
+    if label is None:
+        return payload
+    print(
+        f"price-index {label}: query {(queried - start) * 1000:.1f} ms, "
+        f"aggregate {(aggregated - queried) * 1000:.1f} ms, "
+        f"build {(built - aggregated) * 1000:.1f} ms, "
+        f"serialize {(serialized - built) * 1000:.1f} ms",
+        flush=True,
+    )
+    return payload
+
+
+@ResultCache("price-index-eshop-figure")
+def eshop_figure(eshop, manufacturers):
+    start = time.perf_counter()
+    df = query_eshop_prices(eshop, manufacturers)
+    return render_figure(df, "m_name", "Manufacturer", f"eshop {eshop}", start)
+
 
-        return fig
+@ResultCache("price-index-manufacturer-figure")
+def manufacturer_figure(manufacturer, eshops):
+    start = time.perf_counter()
+    df = query_manufacturer_prices(manufacturer, eshops)
+    return render_figure(df, "e_name", "Eshop", f"manufacturer {manufacturer}", start)
 
 
-def update_data(n_clicks):
-    if n_clicks is None or n_clicks < 1:
+def selections(items):
+    """Every non-empty selection a checklist of ``items`` allows."""
+    return (
+        selection
+        for size in range(1, len(items) + 1)
+        for selection in itertools.combinations(items, size)
+    )
+
+
+def warm_cache():
+    """Render the figures of every eshop and manufacturer selection.
+
+    Run when a web process sees new data, see ``warm_new_data``, so that
+    users are served from the shared cache right away. Each eshop and manufacturer is queried once and its prices are
+    sliced for every selection. Returns the number of figures rendered.
+    """
+    start = time.perf_counter()
+    figures = 0
+    for eshop in ESHOPS:
+        df = query_eshop_prices(eshop, MANUFACTURERS)
+        for selection in selections(MANUFACTURERS):
+            payload = render_figure(
+                df[df["m_name"].isin(selection)], "m_name", "Manufacturer"
+            )
+            eshop_figure.cache.warm(eshop_figure.cache.key(eshop, selection), payload)
+            figures += 1
+    for manufacturer in MANUFACTURERS:
+        df = query_manufacturer_prices(manufacturer, ESHOPS)
+        for selection in selections(ESHOPS):
+            payload = render_figure(df[df["e_name"].isin(selection)], "e_name", "Eshop")
+            manufacturer_figure.cache.warm(
+                manufacturer_figure.cache.key(manufacturer, selection), payload
+            )
+            figures += 1
+    print(
+        f"Warmed {figures} price-index figures in {time.perf_counter() - start:.1f}s",
+        flush=True,
+    )
+    return figures
+
+
+def make_graph_1(manufacturers, eshop, value):
+    if not (manufacturers and eshop):
         return dash.no_update
 
-    import sys
+    return json.loads(eshop_figure(eshop, manufacturers))
 
-    try:
-        crawler_eurovaistine = CrawlerEurovaistine()
-        crawler_eurovaistine.save(crawler_eurovaistine.crawl())
-    except Exception as e:
-        print(f"Exception at updating eurovaistine: {e}", file=sys.stderr)
 
-    try:
-        crawler_herba = CrawlerHerba()
-        crawler_herba.save(crawler_herba.crawl())
-    except Exception as e:
-        print(f"Exception at updating herba: {e}", file=sys.stderr)
+def make_graph_2(eshops, manufacturer, value):
+    if not (manufacturer and eshops):
+        return dash.no_update
 
-    try:
-        crawler_benu = CrawlerBenu()
-        crawler_benu.save(crawler_benu.crawl())
-    except Exception as e:
-        print(f"Exception at updating benu: {e}", file=sys.stderr)
+    return json.loads(manufacturer_figure(manufacturer, eshops))
+
+
+def update_data(n_clicks, n_intervals, job_id):
+    """Queue a crawl on click, then follow its progress until it is done."""
+    if dash.callback_context.triggered_id == "update-button":
+        if not n_clicks:
+            return (dash.no_update,) * 9
+        job = enqueue_crawl()
+    elif job_id is None:
+        return (dash.no_update,) * 9
+    else:
+        job = get_job(job_id)
+
+    lines = (job["message"] or "").splitlines() if job else []
+    if job is not None and job["status"] in ACTIVE_STATUSES:
+        if job["status"] == "queued":
+            lines = ["Waiting for a worker to start the crawl"]
+        return (
+            job["id"],
+            False,
+            True,
+            job["progress"],
+            f"{job['progress']}%",
+            {"visibility": "visible"},
+            [html.Div(line) for line in lines],
+            dash.no_update,
+            dash.no_update,
+        )
 
-    return [0, 0]
+    if job is None:
+        lines = ["The crawl could not be found"]
+    elif job["status"] == "failed":
+        lines = [f"The crawl failed: {job['error']}"]
+    else:
+        lines = job["result"]["summary"]
+    # a new placeholder value redraws both graphs with the new data
+    return (
+        None,
+        True,
+        False,
+        0,
+        "",
+        {"visibility": "hidden"},
+        [html.Div(line) for line in lines],
+        job_id,
+        job_id,
+    )
 
 
 def init_callbacks(dash_app):
@@ -337,23 +447,45 @@ def init_callbacks(dash_app):
         Input("placeholder4", "value"),
     )(make_graph_2)
 
-    dash_app.long_callback(
-        inputs=Input("update-button", "n_clicks"),
-        running=[(Output("update-button", "disabled"), True, False)],
-        output=[Output("placeholder3", "value"), Output("placeholder4", "value")],
+    dash_app.callback(
+        Output("update-job", "data"),
+        Output("update-poll", "disabled"),
+        Output("update-button", "disabled"),
+        Output("update-progress", "value"),
+        Output("update-progress", "label"),
+        Output("update-progress", "style"),
+        Output("update-status", "children"),
+        Output("placeholder3", "value"),
+        Output("placeholder4", "value"),
+        Input("update-button", "n_clicks"),
+        Input("update-poll", "n_intervals"),
+        State("update-job", "data"),
         prevent_initial_call=True,
     )(update_data)
 
     return dash_app
 
 
-def init_dash(server, meta_viewport, lcm):
+def warm_new_data(version):
+    """Warm the shared cache of this host once per data version.
+
+    The crawls run on the worker, whose cache the web processes do not read,
+    so the first web process of a host to see a new version warms it.
+    """
+    if not shared_cache().add(f"price-index-warmed:{version}", True, expire=86400):
+        return
+    try:
+        warm_cache()
+    except Exception as e:
+        print(f"Warming the price-index figures failed: {e!r}", flush=True)
+
+
+def init_dash(server, meta_viewport):
     """Create a Plotly Dash dashboard."""
     dash_app = Dash(
         server=server,
         routes_pathname_prefix="/price-index/",
         meta_tags=[meta_viewport],
-        long_callback_manager=lcm,
     )
 
     # create dash layout
@@ -361,5 +493,6 @@ def init_dash(server, meta_viewport, lcm):
 
     # initialize callbacks
     init_callbacks(dash_app)
+    on_new_data(warm_new_data)
 
     return dash_app.server
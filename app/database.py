@@ -0,0 +1,81 @@
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from config import Config
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that counts checkouts which had to wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _do_get(self):
+        # every pooled and overflow connection is in use, so this checkout waits
+        exhausted = (
+            self._max_overflow > -1
+            and self.checkedin() == 0
+            and self.overflow() >= self._max_overflow
+        )
+        if not exhausted:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.waits += 1
+            self.wait_seconds += time.perf_counter() - start
+
+
+def engine_options():
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_timeout": Config.DB_POOL_TIMEOUT,
+        "pool_recycle": Config.DB_POOL_RECYCLE,
+        "pool_pre_ping": Config.DB_POOL_PRE_PING,
+        "client_encoding": "utf8",
+    }
+    if Config.DB_STATEMENT_TIMEOUT:
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={Config.DB_STATEMENT_TIMEOUT}"
+        }
+    return options
+
+
+def get_engine():
+    """Return the engine shared by the whole process.
+
+    Flask-SQLAlchemy, the Dash apps and the crawlers all use this engine, so
+    each worker process holds a single connection pool.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(
+                    Config.SQLALCHEMY_DATABASE_URI, **engine_options()
+                )
+    return _engine
+
+
+def pool_metrics():
+    pool = get_engine().pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "waits": getattr(pool, "waits", 0),
+        "wait_seconds": round(getattr(pool, "wait_seconds", 0.0), 3),
+    }
@@ -1,7 +1,16 @@
-from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy import SQLAlchemy as _SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 
+
+class SQLAlchemy(_SQLAlchemy):
+    def create_engine(self, sa_url, engine_opts):
+        # reuse the process wide engine instead of opening a second pool
+        from app.database import get_engine
+
+        return get_engine()
+
+
 db = SQLAlchemy()
 migrate = Migrate(compare_type=True)
 login = LoginManager()
@@ -0,0 +1,337 @@
+import json
+import sys
+import threading
+import time
+
+from sqlalchemy import bindparam, text
+
+from config import Config
+from .database import get_engine
+
+JOB_COLUMNS = """
+    id, kind, payload, dedupe_key, status, progress, message, result, error,
+    created_at, started_at, updated_at, finished_at, attempts
+"""
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# the job is running and still belongs to the claim that returned ``job``
+OWNED = "id = :id AND attempts = :attempts AND status = 'running'"
+
+
+class JobLost(Exception):
+    """The job went stale and was claimed again by another worker."""
+
+
+def _job(row):
+    if row is None:
+        return None
+    job = dict(row._mapping)
+    for column in ("created_at", "started_at", "updated_at", "finished_at"):
+        if job[column] is not None:
+            job[column] = job[column].isoformat()
+    return job
+
+
+def enqueue(kind, payload=None, dedupe_key=None):
+    """Queue a job and return it as a dict.
+
+    While a job with the same ``dedupe_key`` is queued or running, that job
+    is returned instead of queueing another one.
+    """
+    with get_engine().begin() as conn:
+        while True:
+            row = conn.execute(
+                text(
+                    f"""
+                INSERT INTO job (kind, payload, dedupe_key, status, progress, attempts, created_at)
+                VALUES (:kind, CAST(:payload AS json), :dedupe_key, 'queued', 0, 0, now())
+                ON CONFLICT (dedupe_key) WHERE status IN ('queued', 'running')
+                DO NOTHING
+                RETURNING {JOB_COLUMNS};
+                """
+                ),
+                kind=kind,
+                payload=json.dumps(payload),
+                dedupe_key=dedupe_key,
+            ).first()
+            if row is None:
+                row = conn.execute(
+                    text(
+                        f"""
+                    SELECT {JOB_COLUMNS} FROM job
+                    WHERE dedupe_key = :dedupe_key
+                    AND status IN ('queued', 'running');
+                    """
+                    ),
+                    dedupe_key=dedupe_key,
+                ).first()
+            # the conflicting job can finish in between, then try again
+            if row is not None:
+                return _job(row)
+
+
+def get_job(job_id):
+    with get_engine().connect() as conn:
+        row = conn.execute(
+            text(f"SELECT {JOB_COLUMNS} FROM job WHERE id = :id;"), id=job_id
+        ).first()
+    return _job(row)
+
+
+def claim():
+    """Mark the oldest queued job as running and return it, or None.
+
+    Concurrent workers skip each other's locked rows, so every job is
+    claimed once. Running jobs without a heartbeat for ``JOB_STALE_AFTER``
+    seconds belong to a worker that died and are claimed again; the new
+    claim bumps ``attempts``, which takes the job from the previous one.
+    """
+    with get_engine().begin() as conn:
+        row = conn.execute(
+            text(
+                f"""
+            UPDATE job SET status = 'running', started_at = now(), updated_at = now(),
+                attempts = attempts + 1
+            WHERE id = (
+                SELECT id FROM job
+                WHERE status = 'queued'
+                OR (status = 'running' AND updated_at < now() - :stale * interval '1 second')
+                ORDER BY id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING {JOB_COLUMNS};
+            """
+            ),
+            stale=Config.JOB_STALE_AFTER,
+        ).first()
+    return _job(row)
+
+
+def set_progress(job, progress, message=None):
+    """Report the progress of a claimed ``job``, raising JobLost if it was taken."""
+    with get_engine().begin() as conn:
+        updated = conn.execute(
+            text(
+                f"""
+            UPDATE job SET progress = :progress, message = :message, updated_at = now()
+            WHERE {OWNED};
+            """
+            ),
+            id=job["id"],
+            attempts=job["attempts"],
+            progress=progress,
+            message=message,
+        ).rowcount
+    if not updated:
+        raise JobLost(f"Job {job['id']} was claimed again")
+
+
+def heartbeat(job):
+    """Keep a claimed ``job`` from going stale, returns False once it was taken."""
+    with get_engine().begin() as conn:
+        return bool(
+            conn.execute(
+                text(f"UPDATE job SET updated_at = now() WHERE {OWNED};"),
+                id=job["id"],
+                attempts=job["attempts"],
+            ).rowcount
+        )
+
+
+def keep_alive(job, stop, interval=None):
+    """Send heartbeats for ``job`` until ``stop`` is set or the job is taken."""
+    interval = Config.JOB_HEARTBEAT_INTERVAL if interval is None else interval
+    while not stop.wait(interval):
+        try:
+            if not heartbeat(job):
+                return
+        except Exception as e:
+            print(
+                f"Exception at job {job['id']} heartbeat: {e!r}",
+                file=sys.stderr,
+                flush=True,
+            )
+
+
+def finish(job, result=None, error=None):
+    """Store the outcome of a claimed ``job``, returns False if it was taken."""
+    with get_engine().begin() as conn:
+        return bool(
+            conn.execute(
+                text(
+                    f"""
+                UPDATE job SET status = :status, progress = 100, result = CAST(:result AS json),
+                    error = :error, updated_at = now(), finished_at = now()
+                WHERE {OWNED};
+                """
+                ),
+                id=job["id"],
+                attempts=job["attempts"],
+                status="failed" if error else "done",
+                result=json.dumps(result),
+                error=error,
+            ).rowcount
+        )
+
+
+def match_crawled(job):
+    """Match the products new to the crawl, returning the summary lines.
+
+    The crawl is saved by then, so a failure is reported, not raised.
+    """
+    from .matching import match_new_products
+
+    set_progress(job, 95, "Matching new products")
+    try:
+        return match_new_products()["summary"]
+    except Exception as e:
+        print(f"Exception while matching new products: {e!r}", file=sys.stderr, flush=True)
+        return [f"Matching new products failed: {e!r}"]
+
+
+def crawl_job(job):
+    """Crawl every eshop and match new products."""
+    from .crawler.orchestrator import run_crawlers
+
+    def report(results, total):
+        set_progress(
+            job,
+            int(90 * len(results) / total),
+            "\n".join(result.summary() for result in results),
+        )
+
+    results = run_crawlers(progress=report)
+    summaries = [result.summary() for result in results]
+    return {
+        "rows": sum(result.rows for result in results),
+        "failed": [result.eshop for result in results if not result.ok],
+        "incomplete": [
+            result.eshop for result in results if result.ok and not result.complete
+        ],
+        "summary": summaries + match_crawled(job),
+    }
+
+
+def crawl_eshop_job(job):
+    """Crawl the eshop of a scheduled job and match new products."""
+    from .crawler.orchestrator import get_crawler, run_crawler
+
+    result = run_crawler(get_crawler(job["payload"]["eshop"]), trigger="schedule")
+    if not result.ok:
+        raise RuntimeError(result.summary())
+    return {
+        "rows": result.rows,
+        "failed_pages": result.failed_pages,
+        "summary": [result.summary()] + match_crawled(job),
+    }
+
+
+def match_job(job):
+    """Propose analog pairs between the eshops, see app/matching.py."""
+    from .matching import run_matching
+
+    set_progress(job, 10, "Matching products")
+    return run_matching()
+
+
+# job kind -> function taking the claimed job and returning its result
+HANDLERS = {
+    "crawl": crawl_job,
+    "crawl-eshop": crawl_eshop_job,
+    "match-analogs": match_job,
+}
+
+
+def enqueue_crawl():
+    """Queue a full crawl, or return the one that is already queued or running."""
+    return enqueue("crawl", dedupe_key="crawl")
+
+
+def enqueue_eshop_crawl(eshop):
+    return enqueue("crawl-eshop", {"eshop": eshop}, dedupe_key=f"crawl:{eshop}")
+
+
+def enqueue_matching():
+    return enqueue("match-analogs", dedupe_key="match-analogs")
+
+
+def active_jobs(dedupe_keys):
+    """Return the queued and running jobs with any of ``dedupe_keys``."""
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            text(
+                f"""
+            SELECT {JOB_COLUMNS} FROM job
+            WHERE dedupe_key IN :dedupe_keys
+            AND status IN ('queued', 'running');
+            """
+            ).bindparams(bindparam("dedupe_keys", expanding=True)),
+            dedupe_keys=list(dedupe_keys),
+        ).all()
+    return [_job(row) for row in rows]
+
+
+def run_job(job):
+    start = time.perf_counter()
+    print(f"Running job {job['id']} ({job['kind']})", flush=True)
+    stop = threading.Event()
+    threading.Thread(target=keep_alive, args=(job, stop), daemon=True).start()
+    try:
+        result = HANDLERS[job["kind"]](job)
+    except JobLost as e:
+        print(f"Stopping job {job['id']}: {e}", file=sys.stderr, flush=True)
+        return
+    except Exception as e:
+        print(f"Exception at job {job['id']}: {e!r}", file=sys.stderr, flush=True)
+        finish(job, error=repr(e))
+        return
+    finally:
+        stop.set()
+    if not finish(job, result=result):
+        print(
+            f"Job {job['id']} was claimed again, dropping its result",
+            file=sys.stderr,
+            flush=True,
+        )
+        return
+    print(
+        f"Finished job {job['id']} in {time.perf_counter() - start:.1f}s", flush=True
+    )
+
+
+def work(stop, poll_interval=None):
+    """Run jobs until ``stop`` is set, polling while the queue is empty."""
+    poll_interval = Config.WORKER_POLL_INTERVAL if poll_interval is None else poll_interval
+    while not stop.is_set():
+        try:
+            job = claim()
+        except Exception as e:
+            print(f"Exception at claiming a job: {e!r}", file=sys.stderr, flush=True)
+            job = None
+        if job is None:
+            stop.wait(poll_interval)
+        else:
+            run_job(job)
+
+
+def run_worker(concurrency=None, poll_interval=None):
+    """Run ``concurrency`` job threads until interrupted."""
+    concurrency = concurrency or Config.WORKER_CONCURRENCY
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=work, args=(stop, poll_interval), daemon=True)
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    print(f"Worker started with {concurrency} job threads", flush=True)
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Worker stopping after the running jobs", flush=True)
+        stop.set()
+        for thread in threads:
+            thread.join()
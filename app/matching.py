@@ -0,0 +1,461 @@
+import glob
+import os
+import re
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sqlalchemy import bindparam, text
+
+from config import Config
+
+from .cache import bump_analogs_version
+from .database import get_engine
+from .search import fold
+
+PRODUCTS_QUERY = """
+    SELECT product.id, product.name, product.manufacturer_id, product.eshop_id,
+        manufacturer.name AS manufacturer
+    FROM product
+    INNER JOIN manufacturer ON product.manufacturer_id = manufacturer.id
+"""
+
+# transaction level advisory lock serializing the matching runs
+MATCH_LOCK = 7231
+# transaction level advisory lock serializing the inserts into analog
+ANALOG_LOCK = 7232
+
+# moves the analog id sequence past the existing IDs; analogs used to be
+# inserted with IDs counted in the browser, which left the sequence behind
+SYNC_ANALOG_IDS = """
+    SELECT setval(
+        pg_get_serial_sequence('analog', 'id'),
+        GREATEST(nextval(pg_get_serial_sequence('analog', 'id')), COALESCE(MAX(id), 0) + 1),
+        false
+    )
+    FROM analog;
+"""
+
+SIZE = re.compile(r"(\d+(?:\.\d+)?)\s*(ml|g|mg|l|vnt|tab|kaps)\b")
+NOT_WORD = re.compile(r"[^\w.]+|(?<!\d)\.|\.(?!\d)")
+
+
+def normalize_name(name, manufacturer):
+    """Fold a product name for matching, dropping the manufacturer's name."""
+    name = fold(name).replace(",", ".")
+    for word in fold(manufacturer).split():
+        name = re.sub(rf"\b{re.escape(word)}\b", " ", name)
+    name = SIZE.sub(r" \1\2 ", name)
+    return " ".join(NOT_WORD.sub(" ", name).split())
+
+
+def sizes(name):
+    return frozenset(SIZE.findall(name))
+
+
+def load_products(conn, product_ids=None):
+    """Products to match, every product unless ``product_ids`` are given."""
+    if product_ids is None:
+        return pd.read_sql_query(PRODUCTS_QUERY + " ORDER BY product.id", conn)
+    query = text(PRODUCTS_QUERY + " WHERE product.id IN :ids ORDER BY product.id")
+    return pd.read_sql_query(
+        query.bindparams(bindparam("ids", expanding=True)),
+        conn,
+        params={"ids": list(product_ids)},
+    )
+
+
+def normalized_names(products):
+    return [
+        normalize_name(name, manufacturer)
+        for name, manufacturer in zip(products["name"], products["manufacturer"])
+    ]
+
+
+def nearest(vectors, target, chunk=2048):
+    """Best match in ``target`` (row, cosine similarity) for every row of ``vectors``.
+
+    ``target`` is transposed, one column per product. TF-IDF rows are l2
+    normalized, so the sparse dot product is the cosine similarity; it is
+    computed for ``chunk`` rows at a time to bound memory.
+    """
+    best = np.empty(vectors.shape[0], dtype=np.int64)
+    score = np.empty(vectors.shape[0], dtype=np.float32)
+    for start in range(0, vectors.shape[0], chunk):
+        similarity = (vectors[start : start + chunk] @ target).toarray()
+        rows = slice(start, start + similarity.shape[0])
+        best[rows] = similarity.argmax(axis=1)
+        score[rows] = similarity[np.arange(similarity.shape[0]), best[rows]]
+    return best, score
+
+
+class MatchIndex:
+    """Name vectors of every matched product, persisted with joblib.
+
+    ``index.joblib`` holds the fitted vectorizer and the number of products
+    indexed. Each manufacturer's block, the ids, eshops, sizes and vectors
+    of its products, is kept in its own file, so matching new products only
+    loads the blocks of their manufacturers.
+    """
+
+    def __init__(self, vectorizer, directory=None):
+        self.vectorizer = vectorizer
+        self.directory = directory or Config.MATCH_INDEX_DIR
+        self.products = 0
+        self.blocks = {}
+        self._changed = set()
+
+    @classmethod
+    def load(cls, directory=None):
+        """Return the saved index, or None if there is none."""
+        index = cls(None, directory)
+        try:
+            saved = joblib.load(index._path("index"))
+        except FileNotFoundError:
+            return None
+        index.vectorizer = saved["vectorizer"]
+        index.products = saved["products"]
+        return index
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.joblib")
+
+    def empty_block(self):
+        return {
+            "product_ids": np.empty(0, dtype=np.int64),
+            "eshop_ids": np.empty(0, dtype=np.int64),
+            "sizes": [],
+            "vectors": scipy.sparse.csr_matrix(
+                (0, len(self.vectorizer.vocabulary_)), dtype=np.float32
+            ),
+        }
+
+    def block(self, manufacturer_id):
+        if manufacturer_id not in self.blocks:
+            try:
+                block = joblib.load(self._path(f"manufacturer-{manufacturer_id}"))
+            except FileNotFoundError:
+                block = self.empty_block()
+            self.blocks[manufacturer_id] = block
+        return self.blocks[manufacturer_id]
+
+    def add(self, manufacturer_id, products, vectors, product_sizes):
+        """Append ``products`` of one manufacturer to its block and return it."""
+        block = self.block(manufacturer_id)
+        block = {
+            "product_ids": np.concatenate(
+                [block["product_ids"], products["id"].to_numpy()]
+            ),
+            "eshop_ids": np.concatenate(
+                [block["eshop_ids"], products["eshop_id"].to_numpy()]
+            ),
+            "sizes": block["sizes"] + list(product_sizes),
+            "vectors": scipy.sparse.vstack([block["vectors"], vectors], format="csr"),
+        }
+        self.blocks[manufacturer_id] = block
+        self._changed.add(manufacturer_id)
+        self.products += len(products)
+        return block
+
+    def save(self, replace=False):
+        """Write the changed blocks, or with ``replace`` only the blocks in memory."""
+        os.makedirs(self.directory, exist_ok=True)
+        if replace:
+            for path in glob.glob(self._path("manufacturer-*")):
+                os.remove(path)
+        for manufacturer_id in self._changed:
+            self._dump(self.blocks[manufacturer_id], f"manufacturer-{manufacturer_id}")
+        # written last, so it never counts products of blocks not yet saved
+        self._dump(
+            {"vectorizer": self.vectorizer, "products": self.products}, "index"
+        )
+        self._changed.clear()
+
+    def _dump(self, value, name):
+        path = self._path(name)
+        joblib.dump(value, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+
+def match_block(block, queries, threshold, pairs):
+    """Add the analog pairs of the ``queries`` rows of a block to ``pairs``.
+
+    A row is paired with its best match in each other eshop of the block
+    when that product's best match in the row's eshop is the row itself
+    and their similarity, halved when the names state different sizes, is
+    at least ``threshold``. ``pairs`` maps ``(product_id_1, product_id_2)``,
+    with the lower id first, to the similarity.
+    """
+    vectors, eshop_ids = block["vectors"], block["eshop_ids"]
+    product_ids, product_sizes = block["product_ids"], block["sizes"]
+    # rows and transposed vectors of every eshop of the block
+    eshops = {}
+    for eshop in np.unique(eshop_ids):
+        rows = np.flatnonzero(eshop_ids == eshop)
+        eshops[eshop] = rows, vectors[rows].T.tocsr()
+
+    # a mutual match is found from either side, so when every row is a
+    # query each pair of eshops only needs to be searched one way
+    every_row = len(queries) == len(eshop_ids)
+    for eshop in np.unique(eshop_ids[queries]):
+        rows, target = eshops[eshop]
+        query = queries[eshop_ids[queries] == eshop]
+        query_vectors = vectors[query]
+        for other, (other_rows, other_target) in eshops.items():
+            if other == eshop or (every_row and other < eshop):
+                continue
+            best, score = nearest(query_vectors, other_target)
+            matched = other_rows[best]
+            back, _ = nearest(vectors[matched], target)
+            # mutual best matches only
+            mutual = rows[back] == query
+            for row_1, row_2, similarity in zip(
+                query[mutual], matched[mutual], score[mutual]
+            ):
+                size_1, size_2 = product_sizes[row_1], product_sizes[row_2]
+                if size_1 and size_2 and not size_1 & size_2:
+                    similarity /= 2
+                if similarity >= threshold:
+                    key = tuple(sorted((int(product_ids[row_1]), int(product_ids[row_2]))))
+                    pairs[key] = round(float(similarity), 3)
+
+
+def as_frame(pairs):
+    return pd.DataFrame(
+        [(id_1, id_2, score) for (id_1, id_2), score in pairs.items()],
+        columns=["product_id_1", "product_id_2", "score"],
+    )
+
+
+def match_products(products, threshold=None, directory=None):
+    """Propose analog pairs between the eshops from ``products``.
+
+    ``products`` has the columns of ``PRODUCTS_QUERY``. Names are compared
+    by the cosine similarity of their TF-IDF character n-grams, only within
+    the same manufacturer, see ``match_block``. Returns a DataFrame of the
+    pairs and their ``score``, and a new unsaved ``MatchIndex`` of the
+    products.
+    """
+    threshold = Config.MATCH_THRESHOLD if threshold is None else threshold
+    vectorizer = TfidfVectorizer(
+        analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True, dtype=np.float32
+    )
+    index = MatchIndex(vectorizer, directory)
+    pairs = {}
+    if products.empty:
+        vectorizer.fit([""])
+        return as_frame(pairs), index
+
+    products = products.reset_index(drop=True)
+    names = normalized_names(products)
+    vectors = vectorizer.fit_transform(names)
+    product_sizes = [sizes(name) for name in names]
+    for manufacturer_id, block in products.groupby("manufacturer_id"):
+        rows = block.index.to_numpy()
+        # a new index, whatever is saved in its directory is replaced
+        index.blocks[manufacturer_id] = index.empty_block()
+        block = index.add(
+            manufacturer_id, block, vectors[rows], [product_sizes[i] for i in rows]
+        )
+        match_block(block, np.arange(len(rows)), threshold, pairs)
+    return as_frame(pairs), index
+
+
+def match_new(index, products, threshold=None):
+    """Match ``products`` against ``index`` and add them to it.
+
+    Only the new products are scored, against the products of their
+    manufacturer, so the work grows with the number of new products.
+    """
+    threshold = Config.MATCH_THRESHOLD if threshold is None else threshold
+    pairs = {}
+    if products.empty:
+        return as_frame(pairs)
+    products = products.reset_index(drop=True)
+    names = normalized_names(products)
+    vectors = index.vectorizer.transform(names)
+    product_sizes = [sizes(name) for name in names]
+    for manufacturer_id, new in products.groupby("manufacturer_id"):
+        rows = new.index.to_numpy()
+        block = index.add(
+            manufacturer_id, new, vectors[rows], [product_sizes[i] for i in rows]
+        )
+        total = len(block["product_ids"])
+        match_block(block, np.arange(total - len(rows), total), threshold, pairs)
+    return as_frame(pairs)
+
+
+def save_candidates(conn, pairs, replace=True):
+    """Queue ``pairs`` for review, skipping the pairs that are analogs already.
+
+    Reviewed candidates are kept, so a rejected pair is not proposed again.
+    With ``replace``, pending candidates that were not proposed this time
+    are dropped.
+    """
+    if replace:
+        conn.execute(text("DELETE FROM analog_candidate WHERE status = 'pending';"))
+    if pairs.empty:
+        return 0
+    return conn.execute(
+        text(
+            """
+        INSERT INTO analog_candidate (product_id_1, product_id_2, score, status, created_at)
+        SELECT c.product_id_1, c.product_id_2, c.score, 'pending', now()
+        FROM unnest(
+            CAST(:ids_1 AS integer[]), CAST(:ids_2 AS integer[]), CAST(:scores AS float8[])
+        ) AS c(product_id_1, product_id_2, score)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM analog
+            WHERE (analog.product_id_1 = c.product_id_1 AND analog.product_id_2 = c.product_id_2)
+            OR (analog.product_id_1 = c.product_id_2 AND analog.product_id_2 = c.product_id_1)
+        )
+        ON CONFLICT (product_id_1, product_id_2) DO UPDATE SET score = EXCLUDED.score
+        WHERE analog_candidate.status = 'pending';
+        """
+        ),
+        ids_1=pairs["product_id_1"].tolist(),
+        ids_2=pairs["product_id_2"].tolist(),
+        scores=pairs["score"].tolist(),
+    ).rowcount
+
+
+def _summary(products, queued, start):
+    summary = (
+        f"Matched {products} products in {time.perf_counter() - start:.1f}s, "
+        f"{queued} candidates to review"
+    )
+    print(summary, flush=True)
+    return {"products": products, "candidates": queued, "summary": [summary]}
+
+
+def _match_all(conn, threshold, start):
+    # every product is matched, so the queue of new products is done too
+    conn.execute(text("DELETE FROM match_queue;"))
+    products = load_products(conn)
+    pairs, index = match_products(products, threshold)
+    queued = save_candidates(conn, pairs)
+    index.save(replace=True)
+    return _summary(len(products), queued, start)
+
+
+def run_matching(threshold=None):
+    """Match every product, replace the pending candidates and rebuild the index."""
+    start = time.perf_counter()
+    with get_engine().begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key);"), key=MATCH_LOCK)
+        return _match_all(conn, threshold, start)
+
+
+def match_new_products(threshold=None):
+    """Match the products queued by ``Crawler.save`` since the last run.
+
+    Falls back to matching every product when there is no saved index, or
+    when it does not cover every other product, e.g. because it was built
+    on another host.
+    """
+    start = time.perf_counter()
+    with get_engine().begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key);"), key=MATCH_LOCK)
+        product_ids = conn.execute(
+            text("DELETE FROM match_queue RETURNING product_id;")
+        ).scalars().all()
+        if not product_ids:
+            return _summary(0, 0, start)
+
+        index = MatchIndex.load()
+        total = conn.execute(text("SELECT count(*) FROM product;")).scalar()
+        if index is None or index.products + len(product_ids) != total:
+            print("The match index is missing or stale, matching every product", flush=True)
+            return _match_all(conn, threshold, start)
+
+        pairs = match_new(index, load_products(conn, product_ids), threshold)
+        queued = save_candidates(conn, pairs, replace=False)
+        index.save()
+        return _summary(len(product_ids), queued, start)
+
+
+# pending candidates for the review table, most confident first
+CANDIDATES_QUERY = text(
+    """
+    SELECT c.id, eshop_1.name || ' ' || p1.name AS product_1,
+        eshop_2.name || ' ' || p2.name AS product_2, c.score
+    FROM analog_candidate AS c
+    INNER JOIN product AS p1 ON p1.id = c.product_id_1
+    INNER JOIN product AS p2 ON p2.id = c.product_id_2
+    INNER JOIN eshop AS eshop_1 ON p1.eshop_id = eshop_1.id
+    INNER JOIN eshop AS eshop_2 ON p2.eshop_id = eshop_2.id
+    WHERE c.status = 'pending'
+    ORDER BY c.score DESC, c.id
+    LIMIT :limit
+    """
+)
+
+
+def pending_candidates(limit=None):
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            CANDIDATES_QUERY, limit=limit or Config.MATCH_REVIEW_LIMIT
+        ).fetchall()
+    return [
+        {
+            "id": row.id,
+            "Product Name 1": row.product_1,
+            "Product Name 2": row.product_2,
+            "Confidence": row.score,
+        }
+        for row in rows
+    ]
+
+
+def lock_analogs(conn):
+    """Serialize the inserts into analog until the transaction of ``conn`` ends.
+
+    Also syncs the id sequence, so the first insert of an upgraded database
+    does not collide with an existing ID.
+    """
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key);"), key=ANALOG_LOCK)
+    conn.execute(text(SYNC_ANALOG_IDS))
+
+
+def accept_candidates(ids):
+    """Turn the pending candidates ``ids`` into analogs, returns the new analog ids."""
+    if not ids:
+        return []
+    with get_engine().begin() as conn:
+        lock_analogs(conn)
+        analog_ids = conn.execute(
+            text(
+                """
+            WITH accepted AS (
+                UPDATE analog_candidate SET status = 'accepted', reviewed_at = now()
+                WHERE id IN :ids AND status = 'pending'
+                RETURNING product_id_1, product_id_2
+            )
+            INSERT INTO analog (product_id_1, product_id_2)
+            SELECT product_id_1, product_id_2 FROM accepted
+            RETURNING id;
+            """
+            ).bindparams(bindparam("ids", expanding=True)),
+            ids=list(ids),
+        ).scalars().all()
+        if analog_ids:
+            bump_analogs_version(conn)
+    return analog_ids
+
+
+def reject_candidates(ids):
+    if not ids:
+        return 0
+    with get_engine().begin() as conn:
+        return conn.execute(
+            text(
+                """
+            UPDATE analog_candidate SET status = 'rejected', reviewed_at = now()
+            WHERE id IN :ids AND status = 'pending';
+            """
+            ).bindparams(bindparam("ids", expanding=True)),
+            ids=list(ids),
+        ).rowcount
@@ -31,6 +31,16 @@ class User(UserMixin, db.Model):
 
 
 class Product(db.Model):
+    # serves the substring filters of the product search, needs pg_trgm
+    __table_args__ = (
+        db.Index(
+            "ix_product_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(256), unique=True, nullable=False)
     url = db.Column(db.String(256), unique=True, nullable=False)
@@ -74,16 +84,47 @@ class Eshop(db.Model):
 class Store(db.Model):
     __tablename__ = "store"
     # __table_args__ = (UniqueConstraint("product_id", "date"),)
+    __table_args__ = (
+        db.Index("ix_store_last_seen", "last_seen"),
+        db.Index("ix_store_product_id_date", "product_id", "date"),
+    )
 
     product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
     price = db.Column(
         db.Float, nullable=False
     )  # primary_key just to not raise errors...
     date = db.Column(db.DateTime(timezone=True), nullable=False, default=func.now())
+    # last crawl that still saw this price, a row covers [date, last_seen]
+    last_seen = db.Column(db.DateTime(timezone=True))
 
     __mapper_args__ = {"primary_key": [product_id, date]}
 
 
+class LatestPrice(db.Model):
+    __tablename__ = "latest_price"
+
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), primary_key=True)
+    price = db.Column(db.Float, nullable=False)
+    # date of the store row holding the current price
+    date = db.Column(db.DateTime(timezone=True), nullable=False)
+    last_seen = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    product = db.relationship("Product", backref=db.backref("latest_price", uselist=False))
+
+
+class PriceDaily(db.Model):
+    __tablename__ = "price_daily"
+
+    date = db.Column(db.Date, primary_key=True)
+    eshop_id = db.Column(db.Integer, db.ForeignKey("eshop.id"), primary_key=True)
+    manufacturer_id = db.Column(
+        db.Integer, db.ForeignKey("manufacturer.id"), primary_key=True
+    )
+    price_sum = db.Column(db.Float, nullable=False)
+    price_count = db.Column(db.Integer, nullable=False)
+    price_mean = db.Column(db.Float, nullable=False)
+
+
 class Analog(db.Model):
     id = db.Column(
         db.Integer,
@@ -94,3 +135,111 @@ class Analog(db.Model):
 
     product_1 = db.relationship("Product", foreign_keys=product_id_1)
     product_2 = db.relationship("Product", foreign_keys=product_id_2)
+
+
+class AnalogCandidate(db.Model):
+    """An analog pair proposed by app/matching.py, waiting for review."""
+
+    __tablename__ = "analog_candidate"
+    # product_id_1 < product_id_2, a pair is proposed at most once
+    __table_args__ = (
+        UniqueConstraint("product_id_1", "product_id_2"),
+        db.Index("ix_analog_candidate_status_score", "status", "score"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id_1 = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
+    product_id_2 = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
+    # cosine similarity of the normalized names
+    score = db.Column(db.Float, nullable=False)
+    # pending, accepted or rejected
+    status = db.Column(db.String(16), nullable=False, default="pending")
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=func.now())
+    reviewed_at = db.Column(db.DateTime(timezone=True))
+
+    product_1 = db.relationship("Product", foreign_keys=product_id_1)
+    product_2 = db.relationship("Product", foreign_keys=product_id_2)
+
+    def __repr__(self):
+        return "<AnalogCandidate {} {}>".format(self.id, self.status)
+
+
+class MatchQueue(db.Model):
+    """A product inserted by Crawler.save that has not been matched yet."""
+
+    __tablename__ = "match_queue"
+
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), primary_key=True)
+    queued_at = db.Column(db.DateTime(timezone=True), nullable=False, default=func.now())
+
+
+class CacheVersion(db.Model):
+    """A counter bumped whenever the data behind a family of caches changes.
+
+    Kept in the database so every process on every host sees the same
+    version, see app/cache.py.
+    """
+
+    __tablename__ = "cache_version"
+
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Job(db.Model):
+    """Background job, claimed by worker.py with SELECT ... FOR UPDATE SKIP LOCKED."""
+
+    __tablename__ = "job"
+    # at most one queued or running job per dedupe_key
+    __table_args__ = (
+        db.Index(
+            "ix_job_active_dedupe_key",
+            "dedupe_key",
+            unique=True,
+            postgresql_where=db.text("status IN ('queued', 'running')"),
+        ),
+        db.Index("ix_job_status", "status"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.JSON)
+    dedupe_key = db.Column(db.String(128))
+    # queued, running, done or failed
+    status = db.Column(db.String(16), nullable=False, default="queued")
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.Text)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=func.now())
+    started_at = db.Column(db.DateTime(timezone=True))
+    # progress heartbeat, a running job that stops updating is claimed again
+    updated_at = db.Column(db.DateTime(timezone=True))
+    # times the job was claimed, only the latest claim may update it
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    finished_at = db.Column(db.DateTime(timezone=True))
+
+    def __repr__(self):
+        return "<Job {} {} {}>".format(self.id, self.kind, self.status)
+
+
+class CrawlRun(db.Model):
+    """One crawl of one eshop, with how long it took and how many rows it saved."""
+
+    __tablename__ = "crawl_run"
+    __table_args__ = (db.Index("ix_crawl_run_eshop_started_at", "eshop", "started_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    eshop = db.Column(db.String(64), nullable=False)
+    # manual or schedule
+    trigger = db.Column(db.String(16), nullable=False)
+    started_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    seconds = db.Column(db.Float, nullable=False)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    # pages skipped after every retry failed, the crawl is incomplete
+    failed_pages = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    error = db.Column(db.Text)
+
+    def __repr__(self):
+        return "<CrawlRun {} {}>".format(self.eshop, self.started_at)
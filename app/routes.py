@@ -1,7 +1,11 @@
-from flask import render_template
+from flask import abort, render_template, jsonify
 from flask import Blueprint
 from flask_login import current_user, login_required, login_user, logout_user
 
+from .cache import cache_metrics
+from .database import pool_metrics
+from .jobs import enqueue_crawl, get_job
+
 routes = Blueprint("routes", __name__)
 
 
@@ -15,7 +19,29 @@ def index():
     )
 
 
-@routes.route("/update-data")
+@routes.route("/update-data", methods=["POST"])
 @login_required
 def update_data():
-    pass
+    """Queue a crawl of every eshop, run by worker.py."""
+    return jsonify(enqueue_crawl()), 202
+
+
+@routes.route("/jobs/<int:job_id>")
+@login_required
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+
+@routes.route("/metrics/pool")
+@login_required
+def metrics_pool():
+    return jsonify(pool_metrics())
+
+
+@routes.route("/metrics/cache")
+@login_required
+def metrics_cache():
+    return jsonify(cache_metrics())
@@ -0,0 +1,76 @@
+import random
+import sys
+import time
+
+from sqlalchemy import text
+
+from config import Config
+from .database import get_engine
+from .jobs import active_jobs, enqueue_eshop_crawl
+
+
+def interval(eshop):
+    """Seconds between scheduled crawls of ``eshop``."""
+    return Config.CRAWL_INTERVALS.get(eshop, Config.CRAWL_INTERVAL) * 3600
+
+
+def jittered(seconds):
+    return seconds * (1 + random.uniform(-Config.CRAWL_JITTER, Config.CRAWL_JITTER))
+
+
+def first_due(eshop):
+    """When to crawl ``eshop`` first, counted from its last recorded run.
+
+    Eshops that were never crawled are spread over the first jitter window
+    instead of all starting at once.
+    """
+    with get_engine().connect() as conn:
+        last = conn.execute(
+            text("SELECT max(started_at) FROM crawl_run WHERE eshop = :eshop;"),
+            eshop=eshop,
+        ).scalar()
+    if last is None:
+        return time.time() + random.uniform(0, Config.CRAWL_JITTER * interval(eshop))
+    return last.timestamp() + jittered(interval(eshop))
+
+
+def schedule(eshop):
+    """Queue a crawl of ``eshop`` unless one is already queued or running."""
+    active = active_jobs(["crawl", f"crawl:{eshop}"])
+    if active:
+        print(
+            f"Skipping {eshop} crawl, job {active[0]['id']} is {active[0]['status']}",
+            flush=True,
+        )
+        return None
+    job = enqueue_eshop_crawl(eshop)
+    print(f"Queued {eshop} crawl as job {job['id']}", flush=True)
+    return job
+
+
+def run_scheduler(crawlers=None, tick=60):
+    """Queue each crawler's eshop on its own interval, forever.
+
+    The crawls themselves are run by worker.py.
+    """
+    from .crawler.orchestrator import CRAWLERS
+
+    eshops = [crawler.eshop for crawler in (CRAWLERS if crawlers is None else crawlers)]
+    due = {eshop: first_due(eshop) for eshop in eshops}
+    for eshop in eshops:
+        print(
+            f"{eshop}: every {interval(eshop) / 3600:g}h, next at "
+            f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(due[eshop]))}",
+            flush=True,
+        )
+
+    while True:
+        for eshop in eshops:
+            if due[eshop] > time.time():
+                continue
+            try:
+                schedule(eshop)
+            except Exception as e:
+                print(f"Exception at scheduling {eshop}: {e!r}", file=sys.stderr)
+            due[eshop] = time.time() + jittered(interval(eshop))
+        time.sleep(max(1, min(tick, min(due.values()) - time.time())))
@@ -0,0 +1,150 @@
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from config import Config
+
+from .cache import data_version
+from .database import get_engine
+
+# every product as the analogs page shows it, "<eshop> <product name>"
+PRODUCT_NAMES_QUERY = text(
+    """
+    SELECT product.id, eshop.name || ' ' || product.name AS name
+    FROM product
+    INNER JOIN eshop ON product.eshop_id = eshop.id
+    ORDER BY name
+    """
+)
+
+WORD = re.compile(r"\w+")
+
+
+def fold(text):
+    """Lowercase ``text`` and strip accents, so "ž" matches "z"."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def words(text):
+    return WORD.findall(fold(text))
+
+
+def trigrams(word):
+    word = f"  {word} "
+    return {word[i : i + 3] for i in range(len(word) - 2)}
+
+
+class ProductIndex:
+    """In-memory typeahead index over product names.
+
+    Every word of a name is kept in a sorted list, so the names whose words
+    start with each of the typed words are found with a binary search. When
+    that finds nothing, e.g. after a typo, names are ranked by the trigrams
+    they share with the query instead.
+    """
+
+    def __init__(self, products):
+        products = list(products)
+        self.ids = [product_id for product_id, _ in products]
+        self.names = [name for _, name in products]
+        self._by_id = dict(products)
+        self._folded = [fold(name) for name in self.names]
+        self._words = sorted(
+            (word, i) for i, name in enumerate(self.names) for word in set(words(name))
+        )
+        self._keys = [word for word, _ in self._words]
+        self._trigrams = defaultdict(set)
+        for word in set(self._keys):
+            for trigram in trigrams(word):
+                self._trigrams[trigram].add(word)
+        self._ids = defaultdict(list)
+        for word, i in self._words:
+            self._ids[word].append(i)
+
+    def __len__(self):
+        return len(self.names)
+
+    def name(self, product_id):
+        return self._by_id.get(product_id)
+
+    def _prefixed(self, prefix):
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + "\uffff", start)
+        return {i for _, i in self._words[start:end]}
+
+    def _rank(self, ids, query, limit):
+        # names starting with the query first, then the shortest names
+        ranked = heapq.nsmallest(
+            limit,
+            ids,
+            key=lambda i: (not self._folded[i].startswith(query), len(self.names[i])),
+        )
+        return [(self.ids[i], self.names[i]) for i in ranked]
+
+    def search(self, query, limit=None):
+        """Return up to ``limit`` ``(id, name)`` matching ``query``, best first."""
+        limit = limit or Config.SEARCH_RESULTS
+        query_words = words(query)
+        if not query_words:
+            return []
+
+        ids = None
+        for word in query_words:
+            matches = self._prefixed(word)
+            ids = matches if ids is None else ids & matches
+            if not ids:
+                break
+        if ids:
+            return self._rank(ids, " ".join(query_words), limit)
+        return self._fuzzy(query_words, limit)
+
+    def _fuzzy(self, query_words, limit):
+        scores = defaultdict(int)
+        for word in query_words:
+            similar = defaultdict(int)
+            for trigram in trigrams(word):
+                for candidate in self._trigrams.get(trigram, ()):
+                    similar[candidate] += 1
+            # words sharing at least half of the trigrams of the typed word
+            needed = max(1, len(trigrams(word)) // 2)
+            for candidate, shared in similar.items():
+                if shared >= needed:
+                    for i in self._ids[candidate]:
+                        scores[i] += shared
+        best = heapq.nsmallest(
+            limit, scores, key=lambda i: (-scores[i], len(self.names[i]))
+        )
+        return [(self.ids[i], self.names[i]) for i in best]
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def load_product_names():
+    with get_engine().connect() as conn:
+        return [(row.id, row.name) for row in conn.execute(PRODUCT_NAMES_QUERY)]
+
+
+def product_index():
+    """Return the product index, rebuilt once new data has been saved."""
+    global _index, _index_version
+    version = data_version()
+    if _index is None or _index_version != version:
+        with _index_lock:
+            if _index is None or _index_version != version:
+                _index = ProductIndex(load_product_names())
+                _index_version = version
+                print(f"Built product index of {len(_index)} products", flush=True)
+    return _index
+
+
+def search_products(query, limit=None):
+    return product_index().search(query, limit)
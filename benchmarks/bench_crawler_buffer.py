@@ -0,0 +1,126 @@
+"""Rows/sec of building a crawled catalogue: per-row pd.concat vs ProductBuffer.
+
+Generates Eurovaistine-style listing pages (48 product cards per page),
+parses them once and then times how fast each accumulation strategy turns
+the parsed cards into a deduplicated DataFrame.
+
+    python benchmarks/bench_crawler_buffer.py --products 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+from lxml import html
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.crawler.buffer import COLUMNS, ProductBuffer  # noqa: E402
+
+CARD = (
+    '<div class="product-card">'
+    '<a class="product-card--link" href="/produktas/{i}"></a>'
+    '<div class="right-content">'
+    '<div class="product-card--title-box"><div>'
+    '<div class="product-card--title"> Uriage product {i} 50 ml </div>'
+    "</div></div>"
+    '<div class="product-card--price">{price}&nbsp;€</div>'
+    "</div></div>"
+)
+
+
+def listing_pages(products, per_page=48):
+    for start in range(0, products, per_page):
+        cards = "".join(
+            CARD.format(i=i, price=f"{5 + i % 40:.2f}".replace(".", ","))
+            for i in range(start, min(start + per_page, products))
+        )
+        yield f'<html><head><meta charset="utf-8"></head><body>{cards}</body></html>'.encode()
+
+
+def parse_page(content):
+    rows = []
+    for element in content.xpath('//div[@class="product-card"]'):
+        _url = element.xpath('a[@class="product-card--link"]/@href')[0]
+        _title = element.xpath(
+            'div[@class="right-content"]/div[@class="product-card--title-box"]/div[1]/div[@class="product-card--title"]/text()'
+        )[0].strip()
+        _price = element.xpath(
+            'div[@class="right-content"]/div[@class="product-card--price"]/text()'
+        )[0]
+        _price = float(
+            _price.strip().replace(",", ".").replace("\xa0", "").replace("€", "")
+        )
+        rows.append((_title, "Uriage", "Eurovaistine", _url, _price))
+    return rows
+
+
+def build_with_concat(pages, dedup_every_row=False):
+    df = pd.DataFrame(columns=COLUMNS)
+    for rows in pages:
+        for title, manufacturer, eshop, url, price in rows:
+            df = pd.concat(
+                [
+                    df,
+                    pd.DataFrame(
+                        {
+                            "title": [title],
+                            "url": [url],
+                            "price": [price],
+                            "manufacturer": [manufacturer],
+                            "eshop": [eshop],
+                        }
+                    ),
+                ]
+            )
+            if dedup_every_row:
+                df = df.drop_duplicates().reset_index(drop=True)
+        df = df.drop_duplicates().reset_index(drop=True)
+    return df
+
+
+def build_with_buffer(pages):
+    products = ProductBuffer()
+    for rows in pages:
+        for row in rows:
+            products.append(*row)
+    return products.to_frame()
+
+
+def timed(name, func, pages, products):
+    start = time.perf_counter()
+    df = func(pages)
+    seconds = time.perf_counter() - start
+    print(
+        f"{name:<32} {len(df):>7} rows {seconds:>9.3f}s {products / seconds:>12.0f} rows/s"
+    )
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument(
+        "--skip-slow",
+        action="store_true",
+        help="skip the per-row drop_duplicates (old Benu) variant",
+    )
+    args = parser.parse_args()
+
+    pages = [parse_page(html.fromstring(page)) for page in listing_pages(args.products)]
+    print(f"{args.products} products on {len(pages)} pages")
+
+    timed("pd.concat per row", build_with_concat, pages, args.products)
+    if not args.skip_slow:
+        timed(
+            "pd.concat + dedup per row",
+            lambda p: build_with_concat(p, dedup_every_row=True),
+            pages,
+            args.products,
+        )
+    timed("ProductBuffer", build_with_buffer, pages, args.products)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Startup time of create_app() with a stubbed database.
+
+The shared engine is replaced by a stub that records every use, so the
+benchmark both times app creation and checks that it does not touch the
+database. The first run includes importing the Dash apps.
+
+    python benchmarks/bench_create_app.py --runs 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app.database  # noqa: E402
+
+database_calls = []
+
+
+def stub_engine():
+    database_calls.append(time.perf_counter())
+    raise RuntimeError("create_app() must not use the database")
+
+
+# patch before the Dash apps import get_engine
+app.database.get_engine = stub_engine
+
+from app import create_app  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        create_app()
+        timings.append(time.perf_counter() - start)
+
+    print(f"first create_app(): {timings[0] * 1000:.1f} ms (includes imports)")
+    if len(timings) > 1:
+        warm = sorted(timings[1:])
+        print(f"warm create_app():  {warm[len(warm) // 2] * 1000:.1f} ms median")
+    print(f"database calls:     {len(database_calls)}")
+
+
+if __name__ == "__main__":
+    main()
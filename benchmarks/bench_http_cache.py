@@ -0,0 +1,115 @@
+"""Repeated crawls with and without the page cache, against a local server.
+
+Serves generated Eurovaistine-style listing pages from a local http server
+and crawls them a few times, printing how many bytes were transferred and
+how many pages had to be parsed. Products are counted, not saved, so no
+database is needed.
+
+    python benchmarks/bench_http_cache.py --products 2000 --validators etag
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_crawler_buffer import listing_pages  # noqa: E402
+from app.crawler.crawler import CrawlerEurovaistine  # noqa: E402
+from app.crawler.http_cache import PageCache  # noqa: E402
+from config import Config  # noqa: E402
+
+# the benchmark hands each crawler its cache explicitly
+Config.CRAWLER_CACHE = False
+
+LAST_MODIFIED = formatdate(time.time() - 3600, usegmt=True)
+
+
+def make_handler(pages, validators, stats):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            stats["requests"] += 1
+            query = parse_qs(urlsplit(self.path).query)
+            page = int(query["page"][0])
+            # past the end the eshop serves its last page again
+            body = pages[min(page, len(pages)) - 1]
+            etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+
+            if (validators == "etag" and self.headers.get("If-None-Match") == etag) or (
+                validators == "last-modified"
+                and self.headers.get("If-Modified-Since") == LAST_MODIFIED
+            ):
+                stats["not_modified"] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            stats["bytes"] += len(body)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            if validators == "etag":
+                self.send_header("ETag", etag)
+            elif validators == "last-modified":
+                self.send_header("Last-Modified", LAST_MODIFIED)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FixtureHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument(
+        "--validators", choices=["etag", "last-modified", "none"], default="etag"
+    )
+    args = parser.parse_args()
+
+    pages = list(listing_pages(args.products))
+    stats = {"requests": 0, "bytes": 0, "not_modified": 0}
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(pages, args.validators, stats)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for cache in (None, PageCache(directory)):
+                label = "no cache" if cache is None else "page cache"
+                for run in range(1, args.runs + 1):
+                    stats.update(requests=0, bytes=0, not_modified=0)
+                    crawler = CrawlerEurovaistine(
+                        base_url=base_url, delay=0, cache=cache
+                    )
+                    crawler.manufacturers = ["uriage"]
+                    parsed_before = 0 if cache is None else cache.parsed
+                    start = time.perf_counter()
+                    rows = crawler.stream(sink=lambda df: None)
+                    seconds = time.perf_counter() - start
+                    if cache is None:
+                        parsed = stats["requests"]
+                    else:
+                        parsed = cache.parsed - parsed_before
+                    print(
+                        f"{label:<10} run {run}: {rows} products in {seconds:.2f}s, "
+                        f"{stats['bytes'] / 1024:.0f} KiB transferred, "
+                        f"{stats['not_modified']} not modified, {parsed} pages parsed"
+                    )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Last-price lookups: DISTINCT ON over store vs the latest_price table.
+
+Runs against the Postgres database in SQLALCHEMY_DATABASE_URI, which must
+already have the application schema (``flask db upgrade``). The synthetic
+products, price history and analogs are created inside one transaction that
+is rolled back at the end, so nothing is left behind.
+
+    python benchmarks/bench_latest_price.py --products 10000 --history 100
+"""
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.crawler.aggregates import refresh_latest_price  # noqa: E402
+from app.dash.analogs import ANALOGS_QUERY  # noqa: E402
+from app.dash.data_table import PRODUCTS_QUERY  # noqa: E402
+from app.database import get_engine  # noqa: E402
+
+# the queries used before the latest_price table, kept for comparison
+LEGACY_PRODUCTS_QUERY = """
+    SELECT DISTINCT ON (product.id) product.id, product.name AS "Product Name", eshop.name AS "Eshop", store.price AS "Last Price", product.url AS "URL", COALESCE(store.last_seen, store.date)::date AS "Date"
+    FROM product
+    INNER JOIN eshop ON product.eshop_id = eshop.id
+    LEFT JOIN store ON product.id = store.product_id
+    ORDER BY product.id, store.date DESC
+"""
+
+LEGACY_ANALOGS_QUERY = """
+    SELECT DISTINCT ON(analog.id) analog.id, p1.name AS product_1, store_1.price, p2.name AS product_2, store_2.price, ROUND(CAST(FLOAT8 (store_1.price - store_2.price) AS NUMERIC), 2) AS pdiff, eshop_1.name AS eshop1, eshop_2.name AS eshop2
+    FROM analog
+    INNER JOIN product AS p1 ON p1.id = analog.product_id_1
+    INNER JOIN product AS p2 ON p2.id = analog.product_id_2
+    INNER JOIN eshop AS eshop_1 ON p1.eshop_id = eshop_1.id
+    INNER JOIN eshop AS eshop_2 ON p2.eshop_id = eshop_2.id
+    LEFT JOIN store AS store_1 ON p1.id = store_1.product_id
+    LEFT JOIN store AS store_2 ON p2.id = store_2.product_id
+    ORDER BY analog.id, store_1.date, store_2.date DESC
+"""
+
+
+def populate(conn, products, history, analogs):
+    conn.execute(
+        text(
+            """
+        INSERT INTO eshop (name) VALUES ('Benchmark A'), ('Benchmark B');
+        INSERT INTO manufacturer (name) VALUES ('Benchmark');
+        INSERT INTO product (name, url, manufacturer_id, eshop_id)
+        SELECT 'Benchmark product ' || i, 'https://example.com/' || i,
+            (SELECT id FROM manufacturer WHERE name = 'Benchmark'),
+            (SELECT id FROM eshop WHERE name = 'Benchmark ' || CASE WHEN i % 2 = 0 THEN 'A' ELSE 'B' END)
+        FROM generate_series(1, :products) AS i;
+        INSERT INTO store (product_id, price, date, last_seen)
+        SELECT product.id, 5 + random() * 40,
+            now() - h * interval '1 day', now() - h * interval '1 day' + interval '12 hours'
+        FROM product
+        CROSS JOIN generate_series(1, :history) AS h
+        WHERE product.name LIKE 'Benchmark product %';
+        INSERT INTO analog (product_id_1, product_id_2)
+        SELECT p1.id, p2.id
+        FROM generate_series(1, :analogs) AS i
+        INNER JOIN product AS p1 ON p1.name = 'Benchmark product ' || (2 * i)
+        INNER JOIN product AS p2 ON p2.name = 'Benchmark product ' || (2 * i + 1);
+        """
+        ),
+        products=products,
+        history=history,
+        analogs=analogs,
+    )
+    refresh_latest_price(conn)
+    conn.execute(text("ANALYZE store; ANALYZE latest_price; ANALYZE product;"))
+
+
+def timed(conn, name, query, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows = len(conn.execute(text(query)).fetchall())
+        timings.append(time.perf_counter() - start)
+    print(f"{name:<22} {rows:>8} rows {min(timings) * 1000:>10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--history", type=int, default=100)
+    parser.add_argument("--analogs", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with get_engine().connect() as conn:
+        transaction = conn.begin()
+        try:
+            start = time.perf_counter()
+            populate(conn, args.products, args.history, args.analogs)
+            store_rows = conn.execute(text("SELECT count(*) FROM store")).scalar()
+            print(
+                f"store has {store_rows} rows "
+                f"(populated in {time.perf_counter() - start:.1f}s)"
+            )
+            timed(conn, "products DISTINCT ON", LEGACY_PRODUCTS_QUERY, args.runs)
+            timed(conn, "products latest_price", PRODUCTS_QUERY, args.runs)
+            timed(conn, "analogs DISTINCT ON", LEGACY_ANALOGS_QUERY, args.runs)
+            timed(conn, "analogs latest_price", ANALOGS_QUERY, args.runs)
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Time the analog matching of generated products across eshops.
+
+Every generated product is listed by a few eshops, each spelling its name
+slightly differently (case, punctuation, unit spacing, word order), so the
+benchmark also reports how many of the true pairs were proposed. Then
+the last ``--new`` products are matched incrementally against a saved
+index of the others, as after a crawl. No database is needed.
+
+    python benchmarks/bench_matching.py --products 20000 --new 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.matching import MatchIndex, match_new, match_products  # noqa: E402
+
+ESHOPS = ["Eurovaistine", "Benu", "Herba", "Gintarine"]
+MANUFACTURERS = ["Uriage", "Vichy", "La Roche-Posay", "Avène", "Bioderma", "Apivita"]
+LINES = ["Eau Thermale", "Bariederm", "Mineral 89", "Dercos", "Hyseac", "Cicaplast"]
+KINDS = ["kremas", "šampūnas", "serumas", "gelis", "purškiklis", "losjonas"]
+USES = ["veidui", "kūnui", "rankoms", "plaukams", "akims", "lūpoms"]
+
+
+def spell(manufacturer, words, size):
+    name = " ".join([manufacturer] + words)
+    variant = random.random()
+    if variant < 0.25:
+        name = name.upper()
+    elif variant < 0.5:
+        name = name.replace(" ", ", ", 1)
+    return f"{name} {size}{random.choice(['', ' '])}ml"
+
+
+def generate(products):
+    rows, truth = [], set()
+    product_id = 0
+    for i in range(products // 2):
+        manufacturer = i % len(MANUFACTURERS)
+        words = [
+            random.choice(LINES),
+            random.choice(KINDS),
+            random.choice(USES),
+            f"N{i}",
+        ]
+        size = random.choice([15, 30, 50, 100, 200, 400])
+        for eshop in random.sample(range(len(ESHOPS)), 2):
+            product_id += 1
+            rows.append(
+                (
+                    product_id,
+                    spell(MANUFACTURERS[manufacturer], words, size),
+                    manufacturer,
+                    eshop,
+                    MANUFACTURERS[manufacturer],
+                )
+            )
+        truth.add((product_id - 1, product_id))
+    columns = ["id", "name", "manufacturer_id", "eshop_id", "manufacturer"]
+    return pd.DataFrame(rows, columns=columns), truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--new", type=int, default=200)
+    parser.add_argument("--threshold", type=float)
+    args = parser.parse_args()
+
+    random.seed(0)
+    products, truth = generate(args.products)
+    start = time.perf_counter()
+    pairs, _ = match_products(products, args.threshold)
+    seconds = time.perf_counter() - start
+
+    report("full", products, pairs, truth, seconds)
+
+    with tempfile.TemporaryDirectory() as directory:
+        old, new = products[: -args.new], products[-args.new :]
+        _, index = match_products(old, args.threshold, directory)
+        index.save()
+        start = time.perf_counter()
+        index = MatchIndex.load(directory)
+        pairs = match_new(index, new, args.threshold)
+        index.save()
+        seconds = time.perf_counter() - start
+    # only the pairs involving a new product can be proposed
+    new_ids = set(new["id"])
+    truth = {pair for pair in truth if pair[0] in new_ids or pair[1] in new_ids}
+    report("incremental", new, pairs, truth, seconds)
+
+
+def report(label, products, pairs, truth, seconds):
+    found = sum((a, b) in truth for a, b in zip(pairs["product_id_1"], pairs["product_id_2"]))
+    print(
+        f"{label:<12} matched {len(products)} products in {seconds:.2f}s: "
+        f"{len(pairs)} pairs proposed, {found} of {len(truth)} true pairs "
+        f"({found / max(len(pairs), 1):.1%} precision)"
+    )
+
+if __name__ == "__main__":
+    main()
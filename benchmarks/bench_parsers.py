@@ -0,0 +1,242 @@
+"""Items/sec and peak memory of the listing page parsers.
+
+Compares the previous per-call ``element.xpath()`` parsing with the
+compiled parsers in app/crawler/parsers.py, including the streaming parse
+of a large Benu page. Every case runs in a forked process so its peak
+memory (the growth of ru_maxrss) is measured on its own.
+
+By default the pages are generated; pass a directory of stored pages named
+``<eshop>-*.html`` (e.g. ``benu-vichy.html``) to parse real ones instead.
+
+    python benchmarks/bench_parsers.py --repeat 5
+    python benchmarks/bench_parsers.py --fixtures ~/pages
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+from lxml import html
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_crawler_buffer import listing_pages  # noqa: E402
+from app.crawler import parsers  # noqa: E402
+from config import Config  # noqa: E402
+
+BENU_CARD = (
+    "<div><div>"
+    '<div class="bnProductCard__top"><a class="bnProductCard__title" href="/vichy-{i}">'
+    "<h3> Vichy product {i} 50 ml </h3></a></div>"
+    '<div class="bnProductCard__bottom"><div class="bnProductCard__price ">'
+    "<span><span><span>{price}&nbsp;€</span></span></span></div></div>"
+    "</div></div>"
+)
+
+HERBA_CARD = (
+    '<li class="item"><h4 class="product-name"><a href="/uriage-{i}">Uriage product {i}</a></h4>'
+    '<div class="price-box">{price_box}</div></li>'
+)
+HERBA_REGULAR = '<span class="regular-price" id="product-price-{i}"><span class="price">{price} €</span></span>'
+HERBA_SPECIAL = (
+    '<p class="old-price"><span class="price" id="old-price-{i}">99,00 €</span></p>'
+    '<p class="special-price"><span class="price" id="product-price-{i}">{price} €</span></p>'
+)
+
+
+def price(i):
+    return f"{5 + i % 40:.2f}".replace(".", ",")
+
+
+def document(body):
+    return f'<html><head><meta charset="utf-8"></head><body>{body}</body></html>'.encode()
+
+
+def generate_fixtures(products):
+    benu = "".join(BENU_CARD.format(i=i, price=price(i)) for i in range(products))
+    herba = []
+    for start in range(0, products, 24):
+        herba.append(
+            document(
+                '<ul class="products-grid">'
+                + "".join(
+                    HERBA_CARD.format(
+                        i=i,
+                        price_box=(HERBA_SPECIAL if i % 3 == 0 else HERBA_REGULAR).format(
+                            i=i, price=price(i)
+                        ),
+                    )
+                    for i in range(start, min(start + 24, products))
+                )
+                + "</ul>"
+            )
+        )
+    return {
+        "eurovaistine": list(listing_pages(products)),
+        "benu": [document(f'<div class="productsList__wrap"><div>{benu}</div></div>')],
+        "herba": herba,
+    }
+
+
+def load_fixtures(directory):
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*-*.html"))):
+        eshop = os.path.basename(path).split("-")[0].lower()
+        with open(path, "rb") as f:
+            fixtures.setdefault(eshop, []).append(f.read())
+    return fixtures
+
+
+def legacy_eurovaistine(body):
+    """The parsing code before app/crawler/parsers.py, kept for comparison."""
+    rows = []
+    for element in html.fromstring(body).xpath('//div[@class="product-card"]'):
+        _url = element.xpath('a[@class="product-card--link"]/@href')[0]
+        _title = element.xpath(
+            'div[@class="right-content"]/div[@class="product-card--title-box"]/div[1]/div[@class="product-card--title"]/text()'
+        )[0].strip()
+        _price = element.xpath(
+            'div[@class="right-content"]/div[@class="product-card--price"]/text()'
+        )[0]
+        _price = (
+            _price.strip()
+            .replace(",", ".")
+            .replace("&nbsp;", "")
+            .replace("\xa0", "")
+            .replace("€", "")
+        )
+        if not _price:
+            _price = element.xpath(
+                'div[@class="right-content"]/div[@class="product-card--price"]/s/text()'
+            )[0]
+            _price = (
+                _price.strip()
+                .replace(",", ".")
+                .replace("&nbsp;", "")
+                .replace("\xa0", "")
+                .replace("€", "")
+            )
+        rows.append((_title, _url, float(_price)))
+    return rows
+
+
+def legacy_benu(body):
+    rows = []
+    for element in html.fromstring(body).xpath(
+        '//div[@class="productsList__wrap"]/div/div'
+    ):
+        try:
+            _url = element.xpath(
+                'div/div[@class="bnProductCard__top"]/a[@class="bnProductCard__title"]/@href'
+            )[0]
+        except Exception:
+            continue
+        _title = element.xpath(
+            'div/div[@class="bnProductCard__top"]/a[@class="bnProductCard__title"]/h3/text()'
+        )[0].strip()
+        _price = element.xpath(
+            'div/div[@class="bnProductCard__bottom"]/div[@class="bnProductCard__price "]/span/span/span[1]/text()'
+        )[0]
+        _price = (
+            _price.strip()
+            .replace(",", ".")
+            .replace("&nbsp;", "")
+            .replace("\xa0", "")
+            .replace("€", "")
+        )
+        if not _price:
+            continue
+        rows.append((_title, _url, float(_price)))
+    return rows
+
+
+def legacy_herba(body):
+    content = html.fromstring(body)
+    titles = content.xpath('//h4[@class="product-name"]/a/text()')
+    urls = content.xpath('//h4[@class="product-name"]/a/@href')
+    discounted_prices = content.xpath(
+        '//span[contains(@id, "product-price") and not(contains(@id, "side")) and @class!="regular-price"]/text()'
+    )
+    normal_prices = content.xpath(
+        '//span[@class="regular-price" and contains(@id, "product-price") and not(contains(@id, "side"))]/span/text()'
+    )
+    prices = [
+        price.strip()
+        .replace(",", ".")
+        .replace("&nbsp;", "")
+        .replace("\xa0", "")
+        .replace("€", "")
+        for price in discounted_prices + normal_prices
+    ]
+    prices = list(map(float, filter(None, prices)))
+    return list(zip(titles, urls, prices))
+
+
+def compiled(parser, stream=None):
+    def parse(body):
+        if stream is not None:
+            Config.CRAWLER_STREAM_PARSE_BYTES = 0 if stream else sys.maxsize
+        return list(zip(*parser(body, "uriage", "Benchmark")))
+
+    return parse
+
+
+CASES = [
+    ("eurovaistine", "legacy", legacy_eurovaistine),
+    ("eurovaistine", "compiled", compiled(parsers.EUROVAISTINE)),
+    ("benu", "legacy", legacy_benu),
+    ("benu", "compiled", compiled(parsers.BENU, stream=False)),
+    ("benu", "streaming", compiled(parsers.BENU, stream=True)),
+    ("herba", "legacy", legacy_herba),
+    ("herba", "compiled", compiled(parsers.HERBA)),
+]
+
+
+def run_case(parse, pages, repeat, results):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    items = 0
+    for _ in range(repeat):
+        for body in pages:
+            items += len(parse(body))
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    results.put((items, seconds, peak))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixtures", help="directory of stored <eshop>-*.html pages")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        fixtures = generate_fixtures(args.products)
+
+    context = multiprocessing.get_context("fork")
+    for eshop, name, parse in CASES:
+        pages = fixtures.get(eshop)
+        if not pages:
+            continue
+        results = context.Queue()
+        process = context.Process(
+            target=run_case, args=(parse, pages, args.repeat, results)
+        )
+        process.start()
+        items, seconds, peak = results.get()
+        process.join()
+        size = sum(len(page) for page in pages) / 1024 / 1024
+        print(
+            f"{eshop:<13} {name:<10} {len(pages):>4} pages {size:>6.1f} MiB "
+            f"{items / seconds:>10.0f} items/s  peak +{peak / 1024:.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Crawl a flaky local server with the engine's retry policy.
+
+Serves generated Eurovaistine-style listing pages from a local http server
+that fails a share of the requests with 503 or 429 (with ``Retry-After``),
+never the same page more than ``CRAWLER_MAX_ATTEMPTS - 1`` times in a row,
+and crawls them, printing how many products were found, how long it took
+and how many requests the server saw. The run fails (exit status 1) unless
+every product was found without a failed page.
+
+With ``--down`` the server answers every request with 503 or 429. The run
+then fails unless the circuit breaker opened within ``--max-requests``
+requests (by default the breaker threshold plus the requests in flight).
+Products are counted, not saved, so no database is needed.
+
+    python benchmarks/bench_retry.py --failure-rate 0.3
+    python benchmarks/bench_retry.py --down
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_crawler_buffer import listing_pages  # noqa: E402
+from app.crawler.crawler import CrawlerEurovaistine  # noqa: E402
+from config import Config  # noqa: E402
+
+Config.CRAWLER_CACHE = False
+Config.CRAWLER_RETRY_BACKOFF = 0.05
+
+
+def make_handler(pages, failure_rate, down, stats):
+    # failures in a row by path, kept below the attempts of a request
+    streaks = {}
+
+    class FlakyHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            stats["requests"] += 1
+            streak = streaks.get(self.path, 0)
+            flaky = streak < Config.CRAWLER_MAX_ATTEMPTS - 1
+            if down or (flaky and random.random() < failure_rate):
+                streaks[self.path] = streak + 1
+                stats["failed"] += 1
+                if random.random() < 0.5:
+                    self.send_response(429)
+                    self.send_header("Retry-After", "0")
+                else:
+                    self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            streaks[self.path] = 0
+            query = parse_qs(urlsplit(self.path).query)
+            page = int(query["page"][0])
+            # past the end the eshop serves its last page again
+            body = pages[min(page, len(pages)) - 1]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FlakyHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--failure-rate", type=float, default=0.3)
+    parser.add_argument("--down", action="store_true", help="fail every request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=Config.CRAWLER_BREAKER_THRESHOLD + Config.CRAWLER_CONCURRENCY,
+        help="requests allowed before the breaker opens with --down",
+    )
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    pages = list(listing_pages(args.products))
+    stats = {"requests": 0, "failed": 0}
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(pages, args.failure_rate, args.down, stats)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        crawler = CrawlerEurovaistine(
+            base_url=f"http://127.0.0.1:{server.server_address[1]}", delay=0
+        )
+        crawler.manufacturers = ["uriage"]
+        engines = []
+        create_crawl_engine = crawler.create_crawl_engine
+
+        def create_tracked_engine():
+            engines.append(create_crawl_engine())
+            return engines[-1]
+
+        crawler.create_crawl_engine = create_tracked_engine
+        start = time.perf_counter()
+        rows = crawler.stream(sink=lambda df: None)
+        seconds = time.perf_counter() - start
+        print(
+            f"{rows} of {args.products} products in {seconds:.2f}s, "
+            f"{stats['requests']} requests, {stats['failed']} failed"
+        )
+    finally:
+        server.shutdown()
+
+    opened = engines[0].circuits_opened
+    if args.down:
+        if not opened:
+            sys.exit("FAIL: the circuit breaker never opened")
+        if stats["requests"] > args.max_requests:
+            sys.exit(
+                f"FAIL: {stats['requests']} requests before the circuit breaker "
+                f"opened, expected at most {args.max_requests}"
+            )
+    else:
+        if rows != args.products or crawler.failed_pages:
+            sys.exit(
+                f"FAIL: found {rows} of {args.products} products, "
+                f"{crawler.failed_pages} pages failed"
+            )
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Crawler.save throughput: string-built VALUES statements vs COPY staging.
+
+Runs against the Postgres database in SQLALCHEMY_DATABASE_URI, which must
+already have the application schema (``flask db upgrade``). Use a scratch
+database: the benchmark inserts synthetic products for a "Benchmark" eshop
+and removes them again when it is done.
+
+    python benchmarks/bench_save.py --rows 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.crawler.crawler import Crawler  # noqa: E402
+from app.database import get_engine  # noqa: E402
+
+ESHOP = "Benchmark"
+
+
+def make_frame(rows):
+    run = uuid.uuid4().hex[:8]
+    return pd.DataFrame(
+        {
+            "title": [f"Benchmark product {run} {i} 50 ml" for i in range(rows)],
+            "manufacturer": [f"Benchmark {i % 8}" for i in range(rows)],
+            "eshop": [ESHOP] * rows,
+            "url": [f"https://example.com/{run}/{i}" for i in range(rows)],
+            "price": [5 + (i % 4000) / 100 for i in range(rows)],
+        }
+    )
+
+
+def save_values(df):
+    """The previous implementation of Crawler.save, kept for comparison."""
+    with get_engine().begin() as conn:
+        sql_str = ",".join(f"('{eshop}')" for eshop in df.eshop.unique())
+        conn.execute(
+            f"INSERT INTO eshop (name) VALUES {sql_str} ON CONFLICT (name) DO NOTHING;"
+        )
+        sql_str = ",".join(f"('{m}')" for m in df.manufacturer.unique())
+        conn.execute(
+            f"INSERT INTO manufacturer (name) VALUES {sql_str} ON CONFLICT (name) DO NOTHING;"
+        )
+        sql_str = ",".join(
+            f"""('{title.replace("'", "''")}', '{url.replace("'", "''")}', '{manufacturer}', '{eshop}')"""
+            for title, manufacturer, eshop, url, price in df.itertuples(
+                index=False, name=None
+            )
+        )
+        conn.execute(
+            text(
+                f"""
+            WITH inputvalues(name, url, manufacturer, eshop) AS (VALUES {sql_str})
+            INSERT INTO product (name, url, manufacturer_id, eshop_id)
+            SELECT d.name, d.url, manufacturer.id, eshop.id
+            FROM inputvalues as d
+            INNER JOIN eshop ON eshop.name = d.eshop
+            INNER JOIN manufacturer ON manufacturer.name = d.manufacturer
+            ON CONFLICT DO NOTHING;
+            """
+            )
+        )
+        sql_str = ",".join(
+            f"""((SELECT id FROM product WHERE name='{title.replace("'", "''")}'), {price}, now())"""
+            for title, manufacturer, eshop, url, price in df.itertuples(
+                index=False, name=None
+            )
+        )
+        conn.execute(
+            text(
+                f"""
+            WITH inputvalues(id, price, date) AS (VALUES {sql_str})
+            INSERT INTO store (product_id, price, date)
+            SELECT d.id, d.price, d.date FROM inputvalues as d
+            WHERE d.id IS NOT NULL;
+            """
+            )
+        )
+
+
+def cleanup():
+    with get_engine().begin() as conn:
+        conn.execute(
+            text(
+                """
+            DELETE FROM price_daily USING eshop
+            WHERE price_daily.eshop_id = eshop.id AND eshop.name = :eshop;
+            DELETE FROM latest_price USING product, eshop
+            WHERE latest_price.product_id = product.id
+            AND product.eshop_id = eshop.id AND eshop.name = :eshop;
+            DELETE FROM store USING product, eshop
+            WHERE store.product_id = product.id
+            AND product.eshop_id = eshop.id AND eshop.name = :eshop;
+            DELETE FROM match_queue USING product, eshop
+            WHERE match_queue.product_id = product.id
+            AND product.eshop_id = eshop.id AND eshop.name = :eshop;
+            DELETE FROM analog_candidate USING product, eshop
+            WHERE product.id IN (analog_candidate.product_id_1, analog_candidate.product_id_2)
+            AND product.eshop_id = eshop.id AND eshop.name = :eshop;
+            DELETE FROM product USING eshop
+            WHERE product.eshop_id = eshop.id AND eshop.name = :eshop;
+            DELETE FROM eshop WHERE name = :eshop;
+            DELETE FROM manufacturer WHERE name LIKE 'Benchmark %';
+            """
+            ),
+            eshop=ESHOP,
+        )
+
+
+def timed(name, func, df):
+    start = time.perf_counter()
+    func(df)
+    seconds = time.perf_counter() - start
+    print(
+        f"{name:<10} {len(df):>8} rows {seconds:>9.3f}s {len(df) / seconds:>10.0f} rows/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    crawler = Crawler()
+    try:
+        for rows in args.rows:
+            timed("VALUES", save_values, make_frame(rows))
+            timed("COPY", crawler.save, make_frame(rows))
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Build time and query latency of the analogs page product index.
+
+Indexes generated product names, times typeahead queries against it and
+compares the size of the options the page used to embed with one response
+of the search callback. No database is needed.
+
+    python benchmarks/bench_search.py --products 50000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.search import ProductIndex  # noqa: E402
+
+ESHOPS = ["Eurovaistine", "Benu", "Herba", "Gintarine"]
+MANUFACTURERS = ["Uriage", "Vichy", "La Roche-Posay", "Avène", "Bioderma", "Apivita"]
+WORDS = ["kremas", "šampūnas", "serumas", "gelis", "purškiklis", "losjonas", "balzamas"]
+
+
+def product_names(count):
+    for i in range(count):
+        yield "{} {} {} {} {} ml".format(
+            ESHOPS[i % len(ESHOPS)],
+            MANUFACTURERS[i % len(MANUFACTURERS)],
+            random.choice(WORDS),
+            i,
+            random.choice([15, 30, 50, 100, 200, 400]),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    names = list(product_names(args.products))
+
+    start = time.perf_counter()
+    index = ProductIndex(enumerate(names))
+    print(f"built index of {len(index)} products in {time.perf_counter() - start:.2f}s")
+
+    queries = []
+    for name in random.sample(names, args.queries):
+        words = name.split()
+        # a typed prefix of one or two words, sometimes with a typo
+        query = " ".join(words[1:3])[: random.randint(2, 14)]
+        if random.random() < 0.2 and len(query) > 3:
+            query = query[:2] + query[3] + query[2] + query[4:]
+        queries.append(query)
+
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(
+        f"{len(queries)} queries: median {statistics.median(timings) * 1000:.2f} ms, "
+        f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms"
+    )
+
+    # the page embedded the names as both labels and values
+    options = json.dumps([{"label": name, "value": name} for name in names])
+    response = json.dumps(
+        [{"label": name, "value": i} for i, name in index.search(queries[0])]
+    )
+    print(
+        f"embedded options: {4 * len(options) / 1024:.0f} KiB per page load, "
+        f"search response: {len(response) / 1024:.1f} KiB per query"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,18 @@ BASE_DIR = path.abspath(path.dirname(__file__))
 load_dotenv(path.join(BASE_DIR, ".env"), override=True)
 
 
+def per_eshop(variable, convert=float):
+    """Parse values by eshop, e.g. ``"Benu=12,Herba=48"``, into a dict."""
+    return {
+        eshop.strip(): convert(value)
+        for eshop, value in (
+            item.split("=")
+            for item in environ.get(variable, "").split(",")
+            if item.strip()
+        )
+    }
+
+
 class Config:
     """Flask configuration variables."""
 
@@ -21,3 +33,75 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = environ.get("SQLALCHEMY_DATABASE_URI")
     SQLALCHEMY_TRACK_MODIFICATIONS = environ.get("SQLALCHEMY_TRACK_MODIFICATIONS")
+
+    # Connection pool shared by Flask-SQLAlchemy, the Dash apps and the crawlers
+    DB_POOL_SIZE = int(environ.get("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(environ.get("DB_MAX_OVERFLOW", 5))
+    DB_POOL_TIMEOUT = float(environ.get("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(environ.get("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING = environ.get("DB_POOL_PRE_PING", "1") == "1"
+    # milliseconds, 0 disables the timeout
+    DB_STATEMENT_TIMEOUT = int(environ.get("DB_STATEMENT_TIMEOUT", 0))
+
+    # Caches shared by the worker processes of one host
+    CACHE_DIR = environ.get("CACHE_DIR", "./cache")
+    RESULT_CACHE_SIZE = int(environ.get("RESULT_CACHE_SIZE", 256))
+    # seconds
+    RESULT_CACHE_TTL = int(environ.get("RESULT_CACHE_TTL", 3600))
+    RESULT_CACHE_SHARED = environ.get("RESULT_CACHE_SHARED", "1") == "1"
+    # seconds a process trusts the data versions it read from the database
+    CACHE_VERSION_TTL = float(environ.get("CACHE_VERSION_TTL", 5))
+    # products offered by the analogs page typeahead for a query
+    SEARCH_RESULTS = int(environ.get("SEARCH_RESULTS", 20))
+    # lowest name similarity of a proposed analog pair, from 0 to 1
+    MATCH_THRESHOLD = float(environ.get("MATCH_THRESHOLD", 0.6))
+    # pending analog candidates shown on the analogs page
+    MATCH_REVIEW_LIMIT = int(environ.get("MATCH_REVIEW_LIMIT", 500))
+    # persisted name vectors, so a crawl only matches its new products
+    MATCH_INDEX_DIR = environ.get("MATCH_INDEX_DIR", "./match-index")
+
+    # Crawler
+    CRAWLER_CONCURRENCY = int(environ.get("CRAWLER_CONCURRENCY", 4))
+    CRAWLER_DELAY = float(environ.get("CRAWLER_DELAY", 0.25))
+    # overrides by eshop of the spec or the defaults above,
+    # e.g. CRAWLER_CONCURRENCIES="Herba=2", CRAWLER_DELAYS="Herba=1.5"
+    CRAWLER_CONCURRENCIES = per_eshop("CRAWLER_CONCURRENCIES", int)
+    CRAWLER_DELAYS = per_eshop("CRAWLER_DELAYS")
+    CRAWLER_QUEUE_SIZE = int(environ.get("CRAWLER_QUEUE_SIZE", 8))
+    # only store prices that changed since the last crawl
+    CRAWLER_INCREMENTAL_SAVE = environ.get("CRAWLER_INCREMENTAL_SAVE", "1") == "1"
+    # seconds between refreshes of the daily aggregates during a crawl
+    CRAWLER_REFRESH_INTERVAL = float(environ.get("CRAWLER_REFRESH_INTERVAL", 120))
+    # hours after which an unchanged price starts a new store row
+    CRAWLER_HEARTBEAT_GAP = float(environ.get("CRAWLER_HEARTBEAT_GAP", 36))
+    # conditional requests and reuse of parse results for unchanged pages
+    CRAWLER_CACHE = environ.get("CRAWLER_CACHE", "1") == "1"
+    CRAWLER_CACHE_DIR = environ.get("CRAWLER_CACHE_DIR", "./http-cache")
+    # days an entry is kept after its page was last crawled
+    CRAWLER_CACHE_TTL = float(environ.get("CRAWLER_CACHE_TTL", 14))
+    # pages of this many bytes or more are parsed incrementally where supported
+    CRAWLER_STREAM_PARSE_BYTES = int(environ.get("CRAWLER_STREAM_PARSE_BYTES", 1000000))
+    # attempts per request for connection errors, 429 and 5xx responses
+    CRAWLER_MAX_ATTEMPTS = int(environ.get("CRAWLER_MAX_ATTEMPTS", 4))
+    # seconds, doubled after every failed attempt (with jitter) up to the max
+    CRAWLER_RETRY_BACKOFF = float(environ.get("CRAWLER_RETRY_BACKOFF", 0.5))
+    CRAWLER_RETRY_MAX_WAIT = float(environ.get("CRAWLER_RETRY_MAX_WAIT", 30))
+    # failed requests in a row after which a host is skipped for the cooldown
+    CRAWLER_BREAKER_THRESHOLD = int(environ.get("CRAWLER_BREAKER_THRESHOLD", 10))
+    CRAWLER_BREAKER_COOLDOWN = float(environ.get("CRAWLER_BREAKER_COOLDOWN", 60))
+
+    # Background jobs, run by worker.py
+    WORKER_CONCURRENCY = int(environ.get("WORKER_CONCURRENCY", 1))
+    # seconds between polls of an idle worker
+    WORKER_POLL_INTERVAL = float(environ.get("WORKER_POLL_INTERVAL", 2))
+    # seconds without a heartbeat after which a running job is claimed again
+    JOB_STALE_AFTER = int(environ.get("JOB_STALE_AFTER", 3600))
+    # seconds between heartbeats of a running job, well below JOB_STALE_AFTER
+    JOB_HEARTBEAT_INTERVAL = float(environ.get("JOB_HEARTBEAT_INTERVAL", 60))
+
+    # Scheduled crawls, run by scheduler.py
+    # hours between crawls of an eshop, e.g. CRAWL_INTERVALS="Benu=12,Herba=48"
+    CRAWL_INTERVAL = float(environ.get("CRAWL_INTERVAL", 24))
+    CRAWL_INTERVALS = per_eshop("CRAWL_INTERVALS")
+    # each interval is randomly stretched or shortened by up to this fraction
+    CRAWL_JITTER = float(environ.get("CRAWL_JITTER", 0.1))
@@ -0,0 +1,24 @@
+"""Queue crawls of every eshop on the intervals set in the config.
+
+    python scheduler.py
+"""
+import argparse
+import signal
+
+from app.scheduler import run_scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tick", type=float, default=60)
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        run_scheduler(tick=args.tick)
+    except KeyboardInterrupt:
+        print("Scheduler stopped", flush=True)
+
+
+if __name__ == "__main__":
+    main()
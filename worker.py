@@ -0,0 +1,22 @@
+"""Run background jobs, such as the crawls queued by the Update button.
+
+    python worker.py --concurrency 2
+"""
+import argparse
+import signal
+
+from app.jobs import run_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args()
+
+    # stop like on ctrl-c when the platform asks the process to exit
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    run_worker(args.concurrency)
+
+
+if __name__ == "__main__":
+    main()